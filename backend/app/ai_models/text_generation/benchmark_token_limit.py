@@ -0,0 +1,66 @@
+import random
+import time
+
+from ai_models.text_generation.token_limit import token_count, TokenBudgeter
+
+# 실행: backend/app 에서 python -m ai_models.text_generation.benchmark_token_limit
+
+# 기존 방식: 줄마다 token_count, 예산마다 전체를 다시 순회
+def legacy_load_text_from_bottom(text, max_token, gpt_version):
+    lines = text.split('\n')[::-1]
+
+    total_lines = []
+    token_sum = 0
+    for line in lines:
+        token_sum += token_count(line + '\n', gpt_version)
+        if token_sum > max_token:
+            break
+        total_lines.append(line)
+
+    return '\n'.join(total_lines[::-1])
+
+
+def create_synthetic_export(target_bytes, star_name="엄마", user_name="나"):
+    # 카카오톡 앱 내보내기 형식의 가짜 대화 생성
+    words = ["밥", "먹었어", "오늘", "날씨", "좋다", "사랑해", "조심히", "들어가", "ㅋㅋㅋ", "응", "내일", "보자", "아들", "고마워"]
+    lines = [f"{star_name} 님과 카카오톡 대화", "저장한 날짜 : 2024-01-05 14:31:02", ""]
+    size = sum(len(line.encode("utf-8")) + 1 for line in lines)
+
+    rng = random.Random(0)
+    while size < target_bytes:
+        speaker = star_name if rng.random() < 0.5 else user_name
+        content = " ".join(rng.choice(words) for _ in range(rng.randint(1, 12)))
+        line = f"2023년 {rng.randint(1, 12)}월 {rng.randint(1, 28)}일 오후 {rng.randint(1, 12)}:{rng.randint(0, 59):02d}, {speaker} : {content}"
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+
+    return "\n".join(lines)
+
+
+def measure(name, func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<40} {best * 1000:10.1f} ms")
+
+
+if __name__ == '__main__':
+
+    text = create_synthetic_export(50 * 1024 * 1024)
+    print(f"synthetic export: {len(text.encode('utf-8')) / 1024 / 1024:.1f} MB, {text.count(chr(10)) + 1} lines")
+
+    def legacy():
+        legacy_load_text_from_bottom(text, 12000, 'gpt3.5')
+        legacy_load_text_from_bottom(text, 4000, 'gpt4')
+
+    def budgeter():
+        budgeter = TokenBudgeter(text, 'gpt3.5')
+        budgeter.load_text_from_bottom(12000)
+        budgeter.load_text_from_bottom(4000)
+
+    assert legacy_load_text_from_bottom(text, 12000, 'gpt3.5') == TokenBudgeter(text, 'gpt3.5').load_text_from_bottom(12000)
+
+    measure("legacy (12k + 4k)", legacy)
+    measure("TokenBudgeter (12k + 4k, one pass)", budgeter)
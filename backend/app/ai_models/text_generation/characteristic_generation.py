@@ -1,20 +1,216 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+from cachetools import LRUCache
+
+from ai_models.text_generation.prompt_template import prompt_templates
+from ai_models.text_generation.token_limit import get_encoding
+
+
 def merge_prompt_text(text,prompt_file_path):
-    with open(prompt_file_path, 'r', encoding='utf-8') as file:
-        char_prompt = file.read()
+    # 프롬프트 파일은 한 번만 읽음 (파일이 바뀌면 다시 읽음)
+    char_prompt = prompt_templates.text(prompt_file_path)
     prompt = char_prompt + text    
     return prompt
 
-def get_characteristics(prompt,client):
+def get_characteristics(prompt,llm):
     
     messages = [{'role': 'system', 'content': prompt}]
 
-    response = client.chat.completions.create(
+    assistant_response = llm.complete_sync(
         model="gpt-3.5-turbo-16k",
         top_p=0.1,
         temperature=0,
         messages=messages
     )
 
-    assistant_response = response.choices[0].message.content
+    return assistant_response
+
+async def get_characteristics_async(prompt,llm):
+
+    messages = [{'role': 'system', 'content': prompt}]
+
+    # gateway 루프에서 실행하고 호출한 이벤트 루프에서는 블로킹 없이 기다림
+    return await llm.submit(llm.complete(
+        model="gpt-3.5-turbo-16k",
+        top_p=0.1,
+        temperature=0,
+        messages=messages
+    ))
+
+class ChunkSampler:
+    # 대화 순서를 유지하면서 max_token 이하의 구간으로 나누고, 전체에서 고르게 최대 max_chunks개만 보관
+    # 넘치면 하나 건너 하나씩 버리고 간격을 두 배로 늘림 (전체 구간 수를 몰라도 메모리 일정, 같은 입력이면 같은 구간)
+    def __init__(self, max_token, max_chunks):
+        self.max_token = max_token
+        self.max_chunks = max(max_chunks, 1)
+        self.sample = []
+        self.stride = 1
+        self.count = 0
+        self.lines = []
+        self.token_sum = 0
+
+    def append(self, line, tokens):
+        if self.lines and self.token_sum + tokens > self.max_token:
+            self.flush()
+        self.lines.append(line)
+        self.token_sum += tokens
+
+    def flush(self):
+        if self.count % self.stride == 0:
+            self.sample.append('\n'.join(self.lines))
+            if len(self.sample) > self.max_chunks:
+                self.sample = self.sample[::2]
+                self.stride *= 2
+        self.count += 1
+        self.lines = []
+        self.token_sum = 0
+
+    def chunks(self):
+        if self.lines:
+            self.flush()
+        return self.sample
+
+
+class CharacteristicCache:
+    # 구간별 추출 결과 캐시 (프롬프트 + 구간 내용의 sha256 기준)
+    # cache_dir가 있으면 파일로 저장하여 재시작 후에도 재사용, 메모리에는 최근 max_size개만 보관
+    # 디스크는 전체 크기가 max_bytes를 넘으면 오래 사용하지 않은 파일부터 삭제
+    def __init__(self, cache_dir=None, max_size=1024, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory = LRUCache(maxsize=max_size)
+        self.disk_entries = OrderedDict()  # key -> 파일 크기
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            # 재시작 시 기존 파일을 마지막 사용 시간 순서로 복원
+            files = [entry for entry in os.scandir(cache_dir) if entry.is_file() and entry.name.endswith(".json")]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                self.disk_entries[entry.name[:-len(".json")]] = entry.stat().st_size
+                self.disk_bytes += entry.stat().st_size
+            self.evict()
+
+    @staticmethod
+    def make_key(prompt):
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        with self.lock:
+            characteristics = self.memory.get(key)
+            on_disk = key in self.disk_entries
+            if on_disk:
+                self.disk_entries.move_to_end(key)
+        if characteristics is not None:
+            return characteristics
+        if on_disk:
+            try:
+                with open(self.path(key), 'r', encoding='utf-8') as file:
+                    characteristics = json.load(file)["characteristics"]
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                with self.lock:
+                    self.disk_bytes -= self.disk_entries.pop(key, 0)
+                return None
+            with self.lock:
+                self.memory[key] = characteristics
+            return characteristics
+        return None
+
+    def set(self, key, characteristics):
+        with self.lock:
+            self.memory[key] = characteristics
+        if self.cache_dir:
+            path = self.path(key)
+            with open(path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump({"characteristics": characteristics}, file, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+
+            size = os.path.getsize(path)
+            with self.lock:
+                self.disk_bytes += size - self.disk_entries.get(key, 0)
+                self.disk_entries[key] = size
+                self.disk_entries.move_to_end(key)
+            self.evict()
+
+    def evict(self):
+        evicted = []
+        with self.lock:
+            while self.disk_bytes > self.max_bytes and len(self.disk_entries) > 1:
+                evicted_key, evicted_size = self.disk_entries.popitem(last=False)
+                self.disk_bytes -= evicted_size
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            try:
+                os.remove(self.path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+
+def group_by_token_budget(texts, max_token, gpt_version):
+    # 순서를 유지하면서 합계가 max_token 이하인 묶음으로 분할 (진행을 위해 묶음마다 최소 2개)
+    encoding = get_encoding(gpt_version)
+    groups = []
+    group = []
+    token_sum = 0
+    for text, tokens in zip(texts, encoding.encode_batch(texts)):
+        if len(group) >= 2 and token_sum + len(tokens) > max_token:
+            groups.append(group)
+            group = []
+            token_sum = 0
+        group.append(text)
+        token_sum += len(tokens)
+
+    if group:
+        # 마지막에 1개만 남으면 앞 묶음에 합침
+        if len(group) == 1 and groups:
+            groups[-1].extend(group)
+        else:
+            groups.append(group)
+    return groups
+
+
+async def map_reduce_characteristics(chunks, prompt_file_path, reduce_prompt_file_path, llm, cache, reduce_token=12000, concurrency=4):
+    # chunks: ChunkSampler로 나눈 대화 구간
+    # map: 구간별 특징 추출을 동시에 최대 concurrency개까지 실행
+    # reduce: 구간별 결과를 reduce_token 이하의 묶음으로 병합하고, 하나가 남을 때까지 반복
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(prompt):
+        key = cache.make_key(prompt)
+        characteristics = cache.get(key)
+        if characteristics is not None:
+            return characteristics
+
+        async with semaphore:
+            characteristics = await get_characteristics_async(prompt, llm)
+        cache.set(key, characteristics)
+        return characteristics
+
+    async def reduce(group):
+        partial_text = '\n\n'.join(
+            f"[구간 {i + 1}]\n{characteristics}" for i, characteristics in enumerate(group)
+        )
+        return await run(merge_prompt_text(partial_text, reduce_prompt_file_path))
+
+    partial_characteristics = await asyncio.gather(*(run(merge_prompt_text(chunk, prompt_file_path)) for chunk in chunks))
+    if not partial_characteristics:
+        return await run(merge_prompt_text('', prompt_file_path))
 
-    return assistant_response
\ No newline at end of file
+    # reduce 프롬프트 자체와 구간 표시에 쓰이는 토큰을 제외한 예산
+    encoding = get_encoding('gpt3.5')
+    reduce_prompt_token = len(encoding.encode(prompt_templates.text(reduce_prompt_file_path)))
+    group_token = max(reduce_token - reduce_prompt_token, 1)
+    while len(partial_characteristics) > 1:
+        groups = group_by_token_budget(list(partial_characteristics), group_token, 'gpt3.5')
+        partial_characteristics = await asyncio.gather(*(reduce(group) for group in groups))
+    return partial_characteristics[0]
@@ -1,29 +1,71 @@
-def insert_persona_to_prompt(star_name,relationship,system_input_path):
-    with open(system_input_path, 'r', encoding='utf-8') as file:
-        system_input = file.read()
+from ai_models.text_generation.prompt_template import prompt_templates
 
-    system_input = system_input.replace("[star]",star_name)
-    system_input = system_input.replace("[relationship]",relationship)
 
-    return system_input
+def insert_persona_to_prompt(star_name,relationship,system_input_path):
+    # [chat_style]은 남겨두고 merge_prompt_input에서 치환
+    return prompt_templates.render(system_input_path, star=star_name, relationship=relationship)
 
 def merge_prompt_input(characteristics, system_input, text):
     system_prompt = system_input.replace("[chat_style]",characteristics)
     system_prompt = system_prompt + text
     return system_prompt
 
+def build_system_prompt(star_name, relationship, characteristics, text, system_input_path):
+    # [star], [relationship], [chat_style]을 한 번에 치환
+    system_prompt = prompt_templates.render(
+        system_input_path,
+        star=star_name,
+        relationship=relationship,
+        chat_style=characteristics,
+    )
+    return system_prompt + text
+
 def prepare_chat(text):
     messages = [{'role': 'system', 'content': text}]
     return messages
 
-def get_response(client, messages):
-    response = client.chat.completions.create(
+def get_response(llm, messages):
+    assistant_response = llm.complete_sync(
         model="gpt-4-0613",
         top_p=0.1,
         temperature=1,
         messages=messages
     )
-
-    assistant_response = response.choices[0].message.content
     
     return assistant_response
+
+async def get_response_async(llm, messages):
+    # gateway 루프에서 실행하고 호출한 이벤트 루프에서는 블로킹 없이 기다림
+    return await llm.submit(llm.complete(
+        model="gpt-4-0613",
+        top_p=0.1,
+        temperature=1,
+        messages=messages
+    ))
+
+async def get_response_stream_async(llm, messages):
+    # 토큰 단위로 도착하는 delta를 순서대로 반환
+    # 소비를 중단하면(break/취소) 남은 응답을 받지 않고 연결을 닫음
+    async for delta in llm.stream_async(
+        model="gpt-4-0613",
+        top_p=0.1,
+        temperature=1,
+        messages=messages
+    ):
+        yield delta
+
+def summarize_messages(llm, summary, messages):
+    # 기존 요약과 밀려난 대화를 합쳐 새 요약 생성
+    conversation = '\n'.join(f"{message['role']}: {message['content']}" for message in messages)
+    prompt = (
+        "다음은 지금까지의 대화 요약과 이어지는 대화 내용입니다. "
+        "대화에서 나온 사실, 감정, 약속을 빠짐없이 포함하여 한국어로 간결하게 다시 요약하세요.\n\n"
+        f"[기존 요약]\n{summary}\n\n[대화]\n{conversation}"
+    )
+
+    return llm.complete_sync(
+        model="gpt-3.5-turbo-16k",
+        top_p=0.1,
+        temperature=0,
+        messages=[{'role': 'system', 'content': prompt}]
+    )
@@ -0,0 +1,147 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import logging
+import threading
+
+from ai_models.text_generation.token_limit import token_count
+
+logger = logging.getLogger(__name__)
+
+# 메시지마다 role 등으로 추가되는 토큰 수
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# 요약 갱신은 응답 생성과 별도로 백그라운드에서 실행
+summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+
+
+class ContextWindow:
+    # system 프롬프트 + 롤링 요약 + 최근 대화를 token_budget 안에서 유지
+    # 윈도우에서 밀려난 대화는 summarize(summary, messages)로 요약에 합쳐짐
+    # 요약이 끝나기 전까지 밀려난 대화(pending)도 예산이 남으면 요청에 포함
+    def __init__(self, system_prompt, token_budget, max_messages, summarize=None, gpt_version='gpt4'):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summarize = summarize
+        self.gpt_version = gpt_version
+
+        self.system_message = {'role': 'system', 'content': system_prompt}
+        self.system_tokens = self.count_tokens(self.system_message)
+
+        # (message, token 수) 쌍으로 저장하여 다시 세지 않음
+        self.window = deque()
+        self.window_tokens = 0
+
+        self.summary = ""
+        self.summary_tokens = 0
+        self.pending = deque()  # (message, token 수), 요약에 아직 반영되지 않은 밀려난 대화
+        self.summary_future = None
+        self.lock = threading.Lock()
+
+    def set_summary(self, summary):
+        # 저장된 요약으로 이어서 대화할 때
+        with self.lock:
+            self.summary = summary or ""
+            self.summary_tokens = self.count_tokens({'content': self.summary}) if self.summary else 0
+            self.trim()
+
+    def count_tokens(self, message):
+        return token_count(message['content'] or "", self.gpt_version) + MESSAGE_TOKEN_OVERHEAD
+
+    @property
+    def total_tokens(self):
+        return self.system_tokens + self.summary_tokens + self.window_tokens
+
+    def head_messages(self):
+        messages = [self.system_message]
+        if self.summary:
+            messages.append({'role': 'system', 'content': f"[이전 대화 요약]\n{self.summary}"})
+        return messages
+
+    @property
+    def messages(self):
+        # 보관 중인 전체 대화 (요약 대기 중인 대화 포함)
+        with self.lock:
+            messages = self.head_messages()
+            messages.extend(message for message, _ in self.pending)
+            messages.extend(message for message, _ in self.window)
+        return messages
+
+    def build(self, extra_messages):
+        # 요청 메시지 구성: 뒤에 붙는 extra_messages(검색 결과, 이번 입력)까지 token_budget 안에 들어가도록
+        # 최근 대화부터 거꾸로 채우고, 남으면 요약 대기 중인 대화까지 포함
+        extra_tokens = sum(self.count_tokens(message) for message in extra_messages)
+        with self.lock:
+            messages = self.head_messages()
+            available = self.token_budget - self.system_tokens - self.summary_tokens - extra_tokens
+            history = []
+            for message, tokens in itertools.chain(reversed(self.window), reversed(self.pending)):
+                if tokens > available:
+                    break
+                history.append(message)
+                available -= tokens
+        return messages + history[::-1] + list(extra_messages)
+
+    def append(self, message):
+        tokens = self.count_tokens(message)
+        with self.lock:
+            self.window.append((message, tokens))
+            self.window_tokens += tokens
+            evicted = self.trim()
+
+        if evicted:
+            self.refresh_summary()
+
+    def trim(self):
+        # 가장 최근 턴(user + assistant)은 항상 남김
+        evicted = False
+        while len(self.window) > 2 and (
+            self.total_tokens > self.token_budget or len(self.window) > self.max_messages
+        ):
+            message, tokens = self.window.popleft()
+            self.window_tokens -= tokens
+            self.pending.append((message, tokens))
+            evicted = True
+
+        # 요약이 밀리는 경우에도 세션 메모리는 max_messages를 넘지 않도록 오래된 것부터 버림
+        while len(self.pending) > self.max_messages:
+            self.pending.popleft()
+        return evicted
+
+    def refresh_summary(self):
+        if self.summarize is None:
+            with self.lock:
+                self.pending.clear()
+            return
+
+        with self.lock:
+            if self.summary_future is not None or not self.pending:
+                return
+            summary = self.summary
+            folded = [message for message, _ in self.pending]
+            future = summary_executor.submit(self.summarize, summary, folded)
+            self.summary_future = future
+
+        future.add_done_callback(lambda done: self.on_summary_done(done, folded))
+
+    def on_summary_done(self, future, folded):
+        with self.lock:
+            self.summary_future = None
+            try:
+                summary = future.result()
+            except Exception as e:
+                logger.error(f"Error summarizing context: {e}")
+                return
+
+            self.summary = summary
+            self.summary_tokens = self.count_tokens({'content': summary})
+            # 요약에 들어간 메시지만 제거 (그 사이 상한으로 버려진 메시지가 있어도 개수로 세지 않음)
+            folded_ids = {id(message) for message in folded}
+            self.pending = deque(entry for entry in self.pending if id(entry[0]) not in folded_ids)
+
+            # 요약이 길어져 예산을 넘으면 윈도우를 다시 줄임
+            self.trim()
+            has_pending = bool(self.pending)
+
+        if has_pending:
+            self.refresh_summary()
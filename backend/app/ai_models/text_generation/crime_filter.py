@@ -0,0 +1,78 @@
+import re
+import threading
+import unicodedata
+
+from cachetools import TTLCache
+
+# 보이스피싱 의심 키워드 (금융/송금, 계좌번호, URL, 사칭/긴급, 개인정보)
+SUSPICIOUS_PATTERN = re.compile(
+    "|".join([
+        r"돈|입금|송금|이체|계좌|통장|대출|거래|결제|현금|수수료|상품권|기프트\s*카드|빌려|갚",
+        r"비밀\s*번호|비번|인증\s*번호|otp|보안\s*카드|카드\s*번호|공인\s*인증",
+        r"\d{2,6}\s*-\s*\d{2,6}\s*-\s*\d{2,8}|\d{8,}",
+        r"https?://|www\.|\.(?:com|net|kr|ly|me|io)\b|bit\.ly|카톡\s*아이디",
+        r"검찰|경찰|금융\s*감독원|금감원|수사관|은행|캐피탈|택배|저금리",
+        r"급해|급하게|빨리|당장|긴급|지금\s*바로|휴대폰\s*(?:고장|액정)|폰\s*(?:고장|액정)",
+        r"주민\s*(?:등록)?\s*번호|주소|신분증|개인\s*정보|명의|앱\s*설치|원격",
+    ]),
+    re.IGNORECASE,
+)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFKC", text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip().lower()
+
+
+class CrimeFilter:
+    # 1단계: 키워드가 없는 짧은 메시지는 GPT 없이 정상 처리
+    # 2단계: 정규화된 텍스트 기준 GPT 판정 결과 캐시 (LRU + TTL)
+    def __init__(self, short_message_length=30, cache_size=10000, cache_ttl=3600):
+        self.short_message_length = short_message_length
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.lock = threading.Lock()
+        self.counters = {"total": 0, "local_cleared": 0, "cache_hits": 0, "gpt_calls": 0}
+
+    def lookup(self, text):
+        # 판정 가능한 경우 True/False, GPT 확인이 필요한 경우 None 반환
+        normalized = normalize_text(text)
+
+        with self.lock:
+            self.counters["total"] += 1
+
+            if len(normalized) <= self.short_message_length and not SUSPICIOUS_PATTERN.search(normalized):
+                self.counters["local_cleared"] += 1
+                return False
+
+            verdict = self.cache.get(normalized)
+            if verdict is not None:
+                self.counters["cache_hits"] += 1
+                return verdict
+
+            self.counters["gpt_calls"] += 1
+            return None
+
+    def clear(self):
+        # 판정 기준(프롬프트)이 바뀐 경우 캐시된 판정 삭제
+        with self.lock:
+            self.cache.clear()
+
+    def store(self, text, verdict):
+        with self.lock:
+            self.cache[normalize_text(text)] = verdict
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            cache_size = len(self.cache)
+
+        total = counters["total"]
+        return {
+            **counters,
+            "cache_size": cache_size,
+            "local_hit_rate": counters["local_cleared"] / total if total else 0.0,
+            "cache_hit_rate": counters["cache_hits"] / total if total else 0.0,
+            "gpt_call_rate": counters["gpt_calls"] / total if total else 0.0,
+        }
@@ -1,4 +1,4 @@
-def detect_voice_phishing(client,user_input,prompt):
+def detect_voice_phishing(llm,user_input,prompt):
     
     #gpt 구현
     messages = []
@@ -6,14 +6,24 @@ def detect_voice_phishing(client,user_input,prompt):
 
     messages.append({'role': 'user', 'content': user_input})
               
-    response = client.chat.completions.create(
+    assistant_response = llm.complete_sync(
         model= "gpt-3.5-turbo-16k-0613",
         top_p=0,
         temperature=0,
         messages=messages
     )
-
-    assistant_response = response.choices[0].message.content
     return assistant_response
+
+async def detect_voice_phishing_async(llm,user_input,prompt):
+
+    messages = [{'role': 'system', 'content': prompt}, {'role': 'user', 'content': user_input}]
+
+    # gateway 루프에서 실행하고 호출한 이벤트 루프에서는 블로킹 없이 기다림
+    return await llm.submit(llm.complete(
+        model= "gpt-3.5-turbo-16k-0613",
+        top_p=0,
+        temperature=0,
+        messages=messages
+    ))
     
 
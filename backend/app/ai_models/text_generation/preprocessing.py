@@ -1,23 +1,91 @@
+import codecs
+from itertools import chain
 import re
 
-def get_user_name(file_content):
-    for line in file_content.splitlines():
-        if '님과 카카오톡 대화' in line:
-            user_name = line.split('님과 카카오톡 대화')[0].strip()
-            return user_name.strip('\ufeff')
+HEADER_KEYWORD = '님과 카카오톡 대화'
+
+# 앱 내보내기: "2023년 1월 1일 오후 3:00, 이름 : 내용" / "2023. 1. 1. 오후 3:00, 이름 : 내용"
+PATTERN_APP = re.compile(r'^(?P<timestamp>\d[^,]*),\s*(?P<speaker>[^:]+?)\s*:\s*(?P<text>.*)$')
+# PC 내보내기: "[이름] [오후 3:00] 내용", 날짜는 "--------------- 2023년 1월 1일 일요일 ---------------" 구분선
+PATTERN_PC = re.compile(r'^\[(?P<speaker>[^\]]+)\]\s*\[(?P<time>[^\]]*)\]\s*(?P<text>.*)$')
+PATTERN_PC_DATE = re.compile(r'^-{3,}\s*(?P<date>.+?)\s*-{3,}$')
+
+
+def iter_text_lines(file, chunk_size=1 << 20):
+    # 업로드 파일을 chunk 단위로 읽어 줄 단위로 반환 (전체를 메모리에 올리지 않음)
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    remainder = ''
+    while True:
+        chunk = file.read(chunk_size)
+        text = remainder + decoder.decode(chunk, final=not chunk)
+        lines = text.split('\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+        if not chunk:
+            break
+    if remainder:
+        yield remainder.rstrip('\r')
+
+
+def detect_export_format(line):
+    if PATTERN_PC_DATE.match(line) or PATTERN_PC.match(line):
+        return 'pc'
+    if PATTERN_APP.match(line):
+        return 'app'
     return None
 
+
+def iter_records(lines):
+    # (timestamp, speaker, text) 레코드를 순서대로 반환
+    # 형식(app/pc)은 처음 인식된 줄에서 한 번만 결정하고 이후에는 해당 패턴만 적용
+    lines = iter(lines)
+    export_format = None
+    for line in lines:
+        export_format = detect_export_format(line)
+        if export_format:
+            break
+    else:
+        return
+
+    if export_format == 'app':
+        for line in chain([line], lines):
+            match = PATTERN_APP.match(line)
+            if match:
+                yield match.group('timestamp'), match.group('speaker'), match.group('text').strip()
+        return
+
+    current_date = ''
+    for line in chain([line], lines):
+        match = PATTERN_PC.match(line)
+        if match:
+            timestamp = f"{current_date} {match.group('time')}".strip()
+            yield timestamp, match.group('speaker').strip(), match.group('text').strip()
+            continue
+        match_date = PATTERN_PC_DATE.match(line)
+        if match_date:
+            current_date = match_date.group('date')
+
+
+def parse_kakao_export(lines):
+    # 헤더에서 대화 상대(고인) 이름을 찾고, 이후 줄은 레코드 generator로 반환
+    lines = iter(lines)
+    for line in lines:
+        if HEADER_KEYWORD in line:
+            user_name = line.split(HEADER_KEYWORD)[0].strip().strip('\ufeff')
+            return user_name, iter_records(lines)
+    return None, iter(())
+
+
+def get_user_name(file_content):
+    user_name, _ = parse_kakao_export(file_content.splitlines())
+    return user_name
+
 def extract_messages(file_content, user_name):
-    messages = []
-    pattern_app = re.compile(rf'^.*,\s*{re.escape(user_name)}\s*:\s*(.*)$')
-    pattern_pc = re.compile(rf'^\[{re.escape(user_name)}\]\s*\[.*\]\s*(.*)$')
-    for line in file_content.splitlines():
-        match_app = pattern_app.search(line)
-        match_pc = pattern_pc.search(line)
-        if match_app:
-            messages.append(match_app.group(1).strip())
-        elif match_pc:
-            messages.append(match_pc.group(1).strip())
-    
+    messages = [
+        text for _, speaker, text in iter_records(file_content.splitlines())
+        if speaker == user_name
+    ]
+
     messages = '\n'.join(messages)
     return messages
@@ -0,0 +1,75 @@
+import os
+import re
+import threading
+import time
+
+# 프롬프트 파일의 치환 위치: [star], [relationship], [chat_style] 등 (한글이 들어간 [구간 1] 같은 표기는 해당 없음)
+PLACEHOLDER_PATTERN = re.compile(r"\[([a-z_]+)\]")
+
+
+class PromptTemplate:
+    # 파일을 한 번 읽어 (고정 문자열, placeholder 이름) 구간으로 미리 분리
+    def __init__(self, path, text, mtime):
+        self.path = path
+        self.text = text
+        self.mtime = mtime
+        # re.split 결과: 고정 문자열과 placeholder 이름이 번갈아 나옴
+        parts = PLACEHOLDER_PATTERN.split(text)
+        self.literals = parts[0::2]
+        self.names = parts[1::2]
+
+    def render(self, values):
+        # 모든 placeholder를 한 번에 치환, 값이 없는 placeholder는 그대로 남김
+        # (치환된 값 안의 [..]는 다시 치환하지 않음)
+        segments = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            segments.append(values.get(name, f"[{name}]"))
+            segments.append(literal)
+        return ''.join(segments)
+
+
+class TemplateRegistry:
+    # 경로별 컴파일된 템플릿 보관, 파일 mtime이 바뀌면 재시작 없이 다시 읽음
+    # mtime 확인은 경로마다 check_interval초에 한 번
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.templates = {}
+        self.checked_at = {}
+        self.lock = threading.Lock()
+        self.reloads = 0
+
+    def get(self, path):
+        now = time.monotonic()
+        template = self.templates.get(path)
+        if template is not None and now - self.checked_at.get(path, 0) < self.check_interval:
+            return template
+
+        with self.lock:
+            template = self.templates.get(path)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                # 배포 중 파일 교체 등으로 잠시 없는 경우: 이전에 읽은 템플릿 사용
+                if template is None:
+                    raise
+                return template
+            if template is None or template.mtime != mtime:
+                with open(path, 'r', encoding='utf-8') as file:
+                    template = PromptTemplate(path, file.read(), mtime)
+                if path in self.templates:
+                    self.reloads += 1
+                self.templates[path] = template
+            self.checked_at[path] = now
+            return template
+
+    def text(self, path):
+        return self.get(path).text
+
+    def render(self, path, **values):
+        return self.get(path).render(values)
+
+    def stats(self):
+        return {"templates": len(self.templates), "reloads": self.reloads}
+
+
+prompt_templates = TemplateRegistry(check_interval=float(os.getenv("PROMPT_RELOAD_INTERVAL", 1.0)))
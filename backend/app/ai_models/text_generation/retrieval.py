@@ -0,0 +1,97 @@
+from io import BytesIO
+import re
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 문자 n-gram은 crc32 해시로 고정 크기 공간에 매핑 (어휘 사전을 저장하지 않음)
+NUM_FEATURES = 1 << 20
+NGRAM_RANGE = (2, 3)
+
+
+def normalize_text(text):
+    return WHITESPACE_PATTERN.sub(" ", text).strip().lower()
+
+
+def char_ngram_ids(text):
+    text = f" {normalize_text(text)} "
+    ids = []
+    for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        for i in range(len(text) - n + 1):
+            ids.append(zlib.crc32(text[i:i + n].encode("utf-8")) % NUM_FEATURES)
+    return ids
+
+
+class UtteranceIndex:
+    # 고인의 과거 발화에 대한 BM25 인덱스 (문자 2~3-gram)
+    # BM25 가중치를 미리 계산한 CSC 행렬을 사용하여 질의는 열 슬라이스 + 합으로 처리
+    def __init__(self, utterances, matrix):
+        self.utterances = utterances
+        self.matrix = matrix.tocsc()
+
+    @classmethod
+    def build(cls, utterances, k1=1.2, b=0.75):
+        # 빈 발화와 중복 발화는 제외
+        utterances = [utterance for utterance in dict.fromkeys(utterances) if utterance.strip()]
+
+        rows, cols = [], []
+        for row, utterance in enumerate(utterances):
+            ids = char_ngram_ids(utterance)
+            rows.extend([row] * len(ids))
+            cols.extend(ids)
+
+        # 중복 (row, col)은 합쳐져 tf가 됨
+        tf = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32))),
+            shape=(len(utterances), NUM_FEATURES),
+        )
+        tf.sum_duplicates()
+
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_doc_len = doc_len.mean() if len(doc_len) else 0.0
+        doc_freq = np.bincount(tf.indices, minlength=NUM_FEATURES)
+        idf = np.log(1 + (len(utterances) - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        # BM25: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        norm = k1 * (1 - b + b * doc_len / avg_doc_len) if avg_doc_len else np.full(len(utterances), k1)
+        row_index = np.repeat(np.arange(len(utterances)), np.diff(tf.indptr))
+        tf.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm[row_index])
+
+        return cls(utterances, tf)
+
+    def search(self, query, top_k=5):
+        if not self.utterances:
+            return []
+
+        ids = np.unique(char_ngram_ids(query))
+        scores = np.asarray(self.matrix[:, ids].sum(axis=1)).ravel()
+
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [self.utterances[i] for i in candidates if scores[i] > 0]
+
+    def to_bytes(self):
+        buffer = BytesIO()
+        np.savez_compressed(
+            buffer,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+            utterances=np.frombuffer("\n".join(self.utterances).encode("utf-8"), dtype=np.uint8),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(BytesIO(data)) as arrays:
+            matrix = sparse.csc_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]),
+                shape=tuple(arrays["shape"]),
+            )
+            utterances = arrays["utterances"].tobytes().decode("utf-8").split("\n")
+        return cls(utterances if matrix.shape[0] else [], matrix)
@@ -1,6 +1,11 @@
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+from itertools import islice
 import tiktoken
 
-def token_count(text,gpt_version):
+@lru_cache(maxsize=None)
+def get_encoding(gpt_version):
     if gpt_version == 'gpt3.5':
         model_encoding = "gpt-3.5-turbo-16k-0613"
     elif gpt_version == 'gpt4':
@@ -8,8 +13,11 @@ def token_count(text,gpt_version):
     else:
         raise ValueError("버전을 잘못 입력하셨습니다.")
     
-    encoding = tiktoken.encoding_for_model(model_encoding)
-    
+    # 인코더는 모델별로 한 번만 생성
+    return tiktoken.encoding_for_model(model_encoding)
+
+def token_count(text,gpt_version):
+    encoding = get_encoding(gpt_version)
     
     response_token = encoding.encode(text)
        
@@ -17,20 +25,87 @@ def token_count(text,gpt_version):
 
     return total_tokens
 
+def iter_lines_from_bottom(text):
+    # text.split('\n')[::-1]과 같은 순서로, 전체를 나누지 않고 필요한 만큼만 반환
+    end = len(text)
+    while end >= 0:
+        start = text.rfind('\n', 0, end)
+        yield text[start + 1:end]
+        end = start
+
+
+class TokenBudgeter:
+    # 아래에서부터 줄 단위 토큰 수의 누적합을 만들어 두고, 여러 예산(12k, 4k, ...)을
+    # 이진 탐색으로 처리. 인코딩은 가장 큰 예산을 넘을 때까지만 배치로 진행
+    BATCH_SIZE = 512
+
+    def __init__(self, text, gpt_version):
+        self.encoding = get_encoding(gpt_version)
+        if isinstance(text, str):
+            self.remaining_lines = iter_lines_from_bottom(text)
+        else:
+            self.remaining_lines = reversed(text)
+
+        self.lines = []
+        self.prefix_sums = []
+        self.exhausted = False
+        self.batch_size = self.BATCH_SIZE
+
+    def shares_encoding(self, gpt_version):
+        return get_encoding(gpt_version).name == self.encoding.name
+
+    def encode_until(self, max_token):
+        while not self.exhausted and (not self.prefix_sums or self.prefix_sums[-1] <= max_token):
+            batch = list(islice(self.remaining_lines, self.batch_size))
+            if len(batch) < self.batch_size:
+                self.exhausted = True
+            if not batch:
+                break
+
+            token_sum = self.prefix_sums[-1] if self.prefix_sums else 0
+            for tokens in self.encoding.encode_batch([line + '\n' for line in batch]):
+                token_sum += len(tokens)
+                self.prefix_sums.append(token_sum)
+            self.lines.extend(batch)
+            self.batch_size *= 2
+
+    def load_text_from_bottom(self, max_token):
+        self.encode_until(max_token)
+        # 누적 토큰 수가 max_token 이하인 줄 수
+        line_num = bisect_right(self.prefix_sums, max_token)
+
+        # 리스트를 뒤집고, 각 줄을 개행 문자('\n')로 연결
+        return '\n'.join(self.lines[line_num - 1::-1]) if line_num else ''
+
+
 def load_text_from_bottom(text, max_token, gpt_version):
-    lines = text.split('\n')[::-1]
-
-    total_lines = []
-    token_sum = 0
-    for line in lines:
-        new_text = line + '\n'
-        tok = token_count(new_text, gpt_version)
-        token_sum += tok
-    
-        if token_sum > max_token:
-            break
+    return TokenBudgeter(text, gpt_version).load_text_from_bottom(max_token)
+
+
+def iter_encoded_lines(lines, gpt_version, batch_size=512):
+    # (줄, 토큰 수)를 배치 인코딩으로 하나씩 반환, 입력 전체를 메모리에 두지 않음
+    encoding = get_encoding(gpt_version)
+    lines = iter(lines)
+    while batch := list(islice(lines, batch_size)):
+        for line, tokens in zip(batch, encoding.encode_batch([line + '\n' for line in batch])):
+            yield line, len(tokens)
+
+
+class TokenTail:
+    # 스트림의 마지막 max_token 토큰 분량의 줄만 보관
+    # max_token 이하 예산의 load_text_from_bottom 결과는 전체 텍스트로 계산한 것과 같음
+    def __init__(self, max_token):
+        self.max_token = max_token
+        self.entries = deque()  # (줄, 토큰 수)
+        self.token_sum = 0
 
-        total_lines.append(line)
+    def append(self, line, tokens):
+        self.entries.append((line, tokens))
+        self.token_sum += tokens
+        # 가장 오래된 줄을 빼도 max_token 이상이면 그 줄은 어떤 예산에도 포함되지 않음
+        while self.entries and self.token_sum - self.entries[0][1] >= self.max_token:
+            _, evicted_tokens = self.entries.popleft()
+            self.token_sum -= evicted_tokens
 
-    # 리스트를 뒤집고, 각 줄을 개행 문자('\n')로 연결
-    return '\n'.join(total_lines[::-1])
\ No newline at end of file
+    def lines(self):
+        return [line for line, _ in self.entries]
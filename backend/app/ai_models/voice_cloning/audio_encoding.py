@@ -0,0 +1,44 @@
+from io import BytesIO
+
+import numpy as np
+
+# format -> (파일 확장자, content type)
+AUDIO_FORMATS = {
+    "wav": ("wav", "audio/wav"),
+    "flac": ("flac", "audio/flac"),
+    "mp3": ("mp3", "audio/mpeg"),
+    "opus": ("ogg", "audio/ogg"),
+}
+
+
+def to_pcm16_array(wav):
+    # torch tensor / ndarray (float, [-1, 1]) -> mono int16 ndarray
+    if hasattr(wav, "detach"):
+        wav = wav.detach().cpu().numpy()
+    wav = np.asarray(wav, dtype=np.float32).reshape(-1)
+    return (np.clip(wav, -1, 1) * 32767).astype(np.int16)
+
+
+def encode_audio(wav, sample_rate: int, audio_format: str = "wav", bitrate: str = "64k") -> bytes:
+    # 디스크를 거치지 않고 메모리(BytesIO)에서 인코딩
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported audio format: {audio_format}")
+
+    pcm = to_pcm16_array(wav)
+    buffer = BytesIO()
+
+    if audio_format in ("wav", "flac"):
+        import soundfile as sf
+
+        sf.write(buffer, pcm, sample_rate, format=audio_format.upper(), subtype="PCM_16")
+    else:
+        # mp3 / opus는 ffmpeg(pydub)으로 목표 bitrate에 맞춰 압축
+        from pydub import AudioSegment
+
+        segment = AudioSegment(pcm.tobytes(), sample_width=2, frame_rate=sample_rate, channels=1)
+        if audio_format == "mp3":
+            segment.export(buffer, format="mp3", bitrate=bitrate)
+        else:
+            segment.export(buffer, format="ogg", codec="libopus", bitrate=bitrate)
+
+    return buffer.getvalue()
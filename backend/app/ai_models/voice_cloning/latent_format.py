@@ -0,0 +1,61 @@
+import pickle
+import struct
+
+import numpy as np
+
+# XTTS latent(gpt_cond_latent, speaker_embedding) 직렬화 포맷 (버전 포함)
+# [magic 4B][version 1B][dtype 1B][ndim 1B][shape uint32 x ndim][little endian raw data]
+MAGIC = b"VOSL"
+VERSION = 1
+HEADER = struct.Struct("<4sBBB")
+
+DTYPES = {
+    0: np.dtype("<f4"),
+    1: np.dtype("<f2"),
+}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+# 기존 row는 pickle.dumps(tensor) (protocol 2 이상은 항상 0x80으로 시작)
+PICKLE_PREFIX = b"\x80"
+
+
+def to_numpy(value) -> np.ndarray:
+    # torch tensor / ndarray -> ndarray
+    if hasattr(value, "detach"):
+        value = value.detach().cpu().numpy()
+    return np.asarray(value)
+
+
+def encode_latent(value, dtype: str = "float32") -> bytes:
+    array = np.ascontiguousarray(to_numpy(value), dtype=np.dtype(dtype).newbyteorder("<"))
+    code = DTYPE_CODES.get(array.dtype)
+    if code is None:
+        raise ValueError(f"Unsupported latent dtype: {dtype}")
+
+    header = HEADER.pack(MAGIC, VERSION, code, array.ndim) + struct.pack(f"<{array.ndim}I", *array.shape)
+    return header + array.tobytes()
+
+
+def is_legacy_pickle(data: bytes) -> bool:
+    return data[:1] == PICKLE_PREFIX
+
+
+def decode_latent(data: bytes) -> np.ndarray:
+    # 복사 없이 blob 버퍼를 그대로 참조하는 읽기 전용 ndarray 반환
+    magic, version, code, ndim = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Invalid latent data")
+    if version != VERSION:
+        raise ValueError(f"Unsupported latent format version: {version}")
+
+    shape = struct.unpack_from(f"<{ndim}I", data, HEADER.size)
+    offset = HEADER.size + 4 * ndim
+    count = int(np.prod(shape)) if ndim else 1
+    return np.frombuffer(data, dtype=DTYPES[code], count=count, offset=offset).reshape(shape)
+
+
+def load_latent(data: bytes) -> np.ndarray:
+    # 마이그레이션 전의 pickle row도 읽을 수 있도록 포맷 자동 판별
+    if is_legacy_pickle(data):
+        return to_numpy(pickle.loads(data))
+    return decode_latent(data)
@@ -39,7 +39,24 @@ def create_star_vector(model, speech_file):
     return gpt_cond_latent, speaker_embedding
 
 
+# 합성 결과 캐시 키에도 포함되는 추론 파라미터
+INFERENCE_PARAMS = {
+    "language": "ko",
+    "repetition_penalty": 5.0,
+    "temperature": 0.75,
+    "speed": 1,
+}
+SAMPLE_RATE = 24000
+
+
+def to_tensor(latent):
+    # DB에서 읽은 ndarray latent (float16 포함) -> 추론용 float32 tensor
+    return torch.as_tensor(latent).float()
+
+
 def inference(model,text, gpt_cond_latent,speaker_embedding):
+    gpt_cond_latent = to_tensor(gpt_cond_latent)
+    speaker_embedding = to_tensor(speaker_embedding)
 
     prompt = text
     prompt= re.sub("([^\x00-\x7F]|\w)(\.|\。|\?)",r"\1 \2\2",prompt)
@@ -47,14 +64,47 @@ def inference(model,text, gpt_cond_latent,speaker_embedding):
 
     out = model.inference(
                     prompt,
-                    "ko",
+                    INFERENCE_PARAMS["language"],
                     gpt_cond_latent,
                     speaker_embedding,
-                    repetition_penalty=5.0,
-                    temperature=0.75,
-                    speed=1,
+                    repetition_penalty=INFERENCE_PARAMS["repetition_penalty"],
+                    temperature=INFERENCE_PARAMS["temperature"],
+                    speed=INFERENCE_PARAMS["speed"],
                 )
     res = torch.tensor(out["wav"]).unsqueeze(0)
     return res
-    
+
+
+# 문장 부호(. ? ! … ~ 。) 또는 줄바꿈 기준으로 한국어 문장 분리
+SENTENCE_PATTERN = re.compile(r"[^.?!…~。\n]+[.?!…~。]*")
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.findall(text) if sentence.strip()]
+
+
+def to_pcm16(wav):
+    # float [-1, 1] -> 16bit PCM (little endian)
+    wav = torch.as_tensor(wav).detach().cpu().clamp(-1, 1)
+    return (wav * 32767).to(torch.int16).numpy().tobytes()
+
+
+def inference_stream(model, text, gpt_cond_latent, speaker_embedding):
+    # 문장 단위로 XTTS inference_stream을 실행하여 생성되는 대로 PCM chunk 반환
+    gpt_cond_latent = to_tensor(gpt_cond_latent)
+    speaker_embedding = to_tensor(speaker_embedding)
+    for sentence in split_sentences(text):
+        prompt = re.sub("([^\x00-\x7F]|\w)(\.|\。|\?)",r"\1 \2\2",sentence)
+
+        chunks = model.inference_stream(
+                        prompt,
+                        INFERENCE_PARAMS["language"],
+                        gpt_cond_latent,
+                        speaker_embedding,
+                        repetition_penalty=INFERENCE_PARAMS["repetition_penalty"],
+                        temperature=INFERENCE_PARAMS["temperature"],
+                        speed=INFERENCE_PARAMS["speed"],
+                        enable_text_splitting=False,
+                    )
+        for chunk in chunks:
+            yield to_pcm16(chunk)
 
@@ -1,19 +1,32 @@
 import base64
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
-import torchaudio
-from ai_models.voice_cloning.xtts import inference
+from fastapi.responses import Response, StreamingResponse
+from jose import JWTError
+from starlette.concurrency import run_in_threadpool
 from service.s3_service import S3Service
 from schema.request import PlayVoiceRequest
-from database.repository import MessageRepository, GptMessageRepository, StarRepository, UserRepository
+from schema.response import ChatMessagePageSchema
+from database.repository import AdminRepository, MessageRepository, GptMessageRepository, StarRepository, UserRepository
 from service.auth import HTTPException, AuthService
 from service.s3_service import S3Service, get_s3_service
+import asyncio
 import json
 import logging
-from service.ai_serving import voice_cloning_model, ChatGeneration, DetectCrime
+import uuid
+from service.ai_serving import ChatGeneration, DetectCrime
+from service.tts_engine import tts_engine, TTSQueueFull
+from service.audio_cache import audio_cache
+from service.chat_broker import chat_fanout
+from service.chat_session import SessionExpired, session_manager
+from service.message_journal import message_journal
+from service.conversation_resume import load_resume_state
+from service.llm_gateway import llm_gateway
+from service.voice_profile import get_voice_profile, voice_profile_cache
+from service.retrieval_index_cache import load_retrieval_index, retrieval_index_cache
 from security import get_access_token
-from database.orm import Star, User
+from database.orm import Admin, Star, User
+from database.connection import SeesionFactory
 from dotenv import load_dotenv
-import pickle
 
 
 from service.auth import AuthService
@@ -31,9 +44,20 @@ logging.basicConfig(level=logging.DEBUG,
 router = APIRouter(prefix="/chat")
 
 # get path
-audio_dir_path = os.getenv("AUDIO_DIR_PATH")
 voice_phishing_p_data_path = os.getenv("VOICE_PHISHING_PROMPT_PATH")
 
+# 스트리밍 응답 기본값 (메시지의 "stream" 값으로 개별 지정 가능)
+CHAT_STREAMING = os.getenv("CHAT_STREAMING", "false").lower() == "true"
+# 범죄 감지와 응답 생성을 동시에 실행하는 speculative 모드
+CHAT_SPECULATIVE = os.getenv("CHAT_SPECULATIVE", "false").lower() == "true"
+# GPT 응답을 보낸 뒤 음성을 미리 합성하는 모드
+TTS_SPECULATIVE = os.getenv("TTS_SPECULATIVE", "false").lower() == "true"
+
+# 채팅 메시지 한 페이지의 최대 개수
+MESSAGE_PAGE_MAX_LIMIT = int(os.getenv("MESSAGE_PAGE_MAX_LIMIT", 200))
+
+VOICE_PHISHING_WARNING = "의심스러운 메시지가 감지되었습니다. 다시 메시지를 전송해주세요."
+
 # create DetectCrime instance
 detect_crime = DetectCrime(voice_phishing_p_data_path)
 
@@ -47,68 +71,321 @@ def get_authenticated_user(
     return auth_service.verify_user(access_token=access_token, user_repo=user_repo)
 
 
+# 관리자 검증 (운영 지표 조회용, 세션별 user_id/star_id 등이 포함됨)
+def get_authenticated_admin(
+    access_token: str = Depends(get_access_token),
+    auth_service: AuthService = Depends(),
+    admin_repo: AdminRepository = Depends(),
+) -> Admin:
+    try:
+        return auth_service.verify_admin(access_token=access_token, admin_repo=admin_repo)
+    except (JWTError, KeyError):
+        raise HTTPException(status_code=401, detail="Not Authorized")
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections = {}
+    # star마다 여러 소켓(기기) 허용
+    # 전송은 broker를 거쳐 모든 worker에 연결된 해당 star의 소켓으로 전달
+    # turn_id: 같은 턴의 메시지/이벤트를 묶는 id (여러 기기에서 동시에 대화해도 응답을 구분)
+    # source: 보낸 세션의 id, 해당 세션의 소켓에는 전달하지 않음 (자신이 보낸 user 메시지)
+    async def connect(self, websocket: WebSocket, star_id: int, source: str | None = None):
+        await chat_fanout.connect(websocket, star_id, source)
 
-    async def connect(self, websocket: WebSocket, star_id: int):
-        self.active_connections[star_id] = websocket
+    def disconnect(self, websocket: WebSocket):
+        chat_fanout.disconnect(websocket)
 
-    def disconnect(self, star_id: int):
-        del self.active_connections[star_id]
+    async def send_message(self, sender: str, message: str, star_id: int, turn_id: str | None = None, source: str | None = None):
+        message_to_send = {"sender": sender, "content": message, "turn_id": turn_id}
+        if source is not None:
+            message_to_send["source"] = source
+        await chat_fanout.publish_to_star(star_id, message_to_send)
 
-    async def send_message(self, sender: str, message: str, star_id: int):
-        message_to_send = {"sender": sender, "content": message}
-        await self.active_connections[star_id].send_text(json.dumps(message_to_send))
+    async def send_event(self, event: dict, star_id: int):
+        await chat_fanout.publish_to_star(star_id, event)
 
 manager = ConnectionManager()
+# broker로 전송된 이벤트도 세션별 전송량에 포함
+chat_fanout.registry.on_sent = session_manager.record_sent
 message_repo = MessageRepository()
 gpt_message_repo = GptMessageRepository()
 user_input = ""
 
 
-# 최근 채팅 메시지 조회
+# 범죄 감지 필터/캐시 적중률 조회
+@router.get("/metrics/crime-detection")
+def get_crime_detection_metrics(admin: Admin = Depends(get_authenticated_admin)):
+    return detect_crime.stats()
+
+
+# worker에 연결된 WebSocket 수
+@router.get("/metrics/connections")
+def get_connection_metrics(admin: Admin = Depends(get_authenticated_admin)):
+    return chat_fanout.stats()
+
+
+@router.get("/metrics/sessions")
+def get_session_metrics(admin: Admin = Depends(get_authenticated_admin)):
+    return session_manager.stats()
+
+
+@router.get("/metrics/message-journal")
+def get_message_journal_metrics(admin: Admin = Depends(get_authenticated_admin)):
+    return message_journal.stats()
+
+
+# OpenAI 요청 수/재시도/circuit 상태 조회
+@router.get("/metrics/llm")
+def get_llm_metrics(admin: Admin = Depends(get_authenticated_admin)):
+    return llm_gateway.stats()
+
+
+# 검색 인덱스 캐시 적중률 조회
+@router.get("/metrics/retrieval-index")
+def get_retrieval_index_metrics(admin: Admin = Depends(get_authenticated_admin)):
+    return retrieval_index_cache.stats()
+
+
+# TTS worker 풀 큐 길이/지연 시간 조회
+@router.get("/metrics/tts")
+def get_tts_metrics(admin: Admin = Depends(get_authenticated_admin)):
+    return {
+        **tts_engine.stats(),
+        "audio_cache": audio_cache.stats(),
+        "voice_profile_cache": voice_profile_cache.stats(),
+    }
+
+
+# 채팅 메시지 페이지 조회용 커서 (클라이언트에는 불투명한 문자열)
+def encode_cursor(message: dict) -> str:
+    created_at = message.get("created_at")
+    payload = {"created_at": created_at.isoformat() if created_at else None, "seq": message["seq"]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(payload["seq"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# 채팅 메시지 조회
+# 커서 없음: 최신 메시지부터 / before: 커서보다 오래된 메시지 (최신순) / after: 커서 이후 메시지 (시간순)
 @router.get("/{star_id}/messages")
 def get_chat_messages(
     star_id: int, 
-    limit: int = 50 # limit: 반환할 메시지의 최대 개수
-):
+    limit: int = 50, # limit: 반환할 메시지의 최대 개수
+    before: str | None = None,
+    after: str | None = None,
+) -> ChatMessagePageSchema:
+    if before and after:
+        raise HTTPException(status_code=400, detail="Only one of before and after can be used")
+
+    limit = max(1, min(limit, MESSAGE_PAGE_MAX_LIMIT))
+    before_seq = decode_cursor(before) if before else None
+    after_seq = decode_cursor(after) if after else None
+
     try:
-        messages = message_repo.get_messages(star_id, limit)
-        return messages
+        # 다음 페이지 유무 확인을 위해 하나 더 조회
+        messages = message_repo.get_messages_page(star_id, limit + 1, before_seq=before_seq, after_seq=after_seq)
     except Exception as e:
         logger.error(f"Error fetching messages for star {star_id}: {e}")
         raise HTTPException(status_code=500, detail="Error fetching messages")
 
+    next_cursor = encode_cursor(messages[limit - 1]) if len(messages) > limit else None
+    return ChatMessagePageSchema(messages=messages[:limit], next_cursor=next_cursor)
+
+
+# GPT 응답 스트리밍 (start -> delta... -> end)
+async def stream_gpt_answer(chat_generation: ChatGeneration, user_input: str, star_id: int, turn_id: str) -> str:
+    await manager.send_event({"sender": "assistant", "type": "start", "turn_id": turn_id}, star_id)
+
+    answer_chunks = []
+    # gateway 스트림을 직접 await (스레드풀을 점유하지 않음)
+    async for delta in chat_generation.get_gpt_answer_stream(user_input):
+        answer_chunks.append(delta)
+        await manager.send_event({"sender": "assistant", "type": "delta", "content": delta, "turn_id": turn_id}, star_id)
+
+    gpt_response = ''.join(answer_chunks)
+    await manager.send_event({"sender": "assistant", "type": "end", "content": gpt_response, "turn_id": turn_id}, star_id)
+    return gpt_response
+
+
+# 범죄 감지와 GPT 응답 생성을 동시에 시작하고, 감지 결과가 나온 뒤에 응답을 공개
+# 감지되면 생성 중인 응답은 취소/폐기되며 대화 내역에도 남지 않음
+async def speculative_gpt_answer(chat_generation: ChatGeneration, user_input: str, star_id: int, stream: bool, turn_id: str) -> str | None:
+    deltas: asyncio.Queue = asyncio.Queue()
+
+    async def generate():
+        # 취소되면 gateway에서 스트림을 닫음
+        try:
+            async for delta in chat_generation.generate_answer_stream(user_input):
+                await deltas.put(delta)
+        finally:
+            await deltas.put(None)
+
+    check_task = asyncio.create_task(detect_crime.detect_voice_phishing_activity(user_input))
+    generate_task = asyncio.create_task(generate())
+
+    try:
+        is_detected = await check_task
+    except BaseException:
+        generate_task.cancel()
+        raise
+
+    if is_detected:
+        generate_task.cancel()
+        await manager.send_message("assistant", VOICE_PHISHING_WARNING, star_id, turn_id)
+        return None
+
+    # 감지되지 않은 경우: 버퍼에 쌓인 delta부터 순서대로 공개
+    if stream:
+        await manager.send_event({"sender": "assistant", "type": "start", "turn_id": turn_id}, star_id)
+
+    answer_chunks = []
+    while (delta := await deltas.get()) is not None:
+        answer_chunks.append(delta)
+        if stream:
+            await manager.send_event({"sender": "assistant", "type": "delta", "content": delta, "turn_id": turn_id}, star_id)
+    # 생성 중 발생한 예외를 그대로 전달
+    await generate_task
+
+    gpt_response = ''.join(answer_chunks)
+    chat_generation.commit_turn(user_input, gpt_response)
+
+    if stream:
+        await manager.send_event({"sender": "assistant", "type": "end", "content": gpt_response, "turn_id": turn_id}, star_id)
+    else:
+        await manager.send_message("assistant", gpt_response, star_id, turn_id)
+    return gpt_response
+
+
+# WebSocket 인증
+# 1) Sec-WebSocket-Protocol: 브라우저는 new WebSocket(url, ["access_token", token])으로 전달
+# 2) Authorization: Bearer 헤더 (브라우저 외 클라이언트)
+# 3) 연결 후 첫 프레임 {"type": "auth", "token": ...}
+# 4) ?token= query (이전 클라이언트 호환용, URL이 로그에 남으므로 사용하지 않는 것을 권장)
+WS_TOKEN_SUBPROTOCOL = "access_token"
+# 첫 프레임 인증을 기다리는 시간
+CHAT_AUTH_TIMEOUT = float(os.getenv("CHAT_AUTH_TIMEOUT", 5))
+# 토큰 없이 연결하던 이전 클라이언트 허용 (이전 동작, 소유자 확인 없음, 마이그레이션 기간에만 사용)
+CHAT_ALLOW_ANONYMOUS = os.getenv("CHAT_ALLOW_ANONYMOUS", "false").lower() == "true"
+
+
+def get_websocket_header_token(websocket: WebSocket) -> tuple:
+    # (token, 응답할 subprotocol)
+    subprotocols = websocket.scope.get("subprotocols") or []
+    if WS_TOKEN_SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(WS_TOKEN_SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], WS_TOKEN_SUBPROTOCOL
+
+    authorization = websocket.headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials, None
+    return None, None
+
+
+async def receive_auth_frame(websocket: WebSocket) -> tuple:
+    # (token, 인증 프레임이 아닌 첫 메시지)
+    try:
+        data = await asyncio.wait_for(websocket.receive_text(), timeout=CHAT_AUTH_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None, None
+    try:
+        message_data = json.loads(data)
+    except json.JSONDecodeError:
+        return None, data
+    if isinstance(message_data, dict) and message_data.get("type") == "auth":
+        return message_data.get("token"), None
+    return None, data
+
+
+def authorize_star_user(token: str, star_id: int) -> str | None:
+    # 토큰의 user가 star 소유자이면 user_id
+    try:
+        user_id = AuthService().decode_jwt(access_token=token)
+    except Exception:
+        return None
+    return user_id if user_owns_star(star_id, user_id) else None
+
 
 # WebSocket
 @router.websocket("/{star_id}")
 async def websocket_endpoint(
         websocket: WebSocket, 
-        star_id: int
+        star_id: int,
+        token: str | None = None # token: access token (이전 클라이언트 호환용, 헤더/첫 프레임 사용 권장)
     ):
 
-    #p_data 가져오기 (수정필요)
-    p_data = gpt_message_repo.get_p_data(star_id)
-    
-    # p_data가 None이거나 "messages" 키가 없는 경우, 빈 리스트로 처리
-    if p_data is not None and "messages" in p_data:
-        gpt_input_list = p_data["messages"]
+    # worker당 최대 세션 수를 넘으면 대화 상태를 불러오기 전에 거절
+    if session_manager.is_full():
+        await session_manager.reject(websocket)
+        return
+
+    header_token, subprotocol = get_websocket_header_token(websocket)
+    if token and not header_token:
+        logger.warning("Chat WebSocket token passed in query string; use Sec-WebSocket-Protocol or an auth frame")
+    token = header_token or token
+
+    # 연결을 수락한 뒤 종료해야 클라이언트가 종료 코드(1008)를 받을 수 있음
+    await websocket.accept(subprotocol=subprotocol)
+
+    # star의 모든 연결에 대화가 전달되므로 star 소유자만 연결 허용
+    pending_data = None
+    if not token:
+        try:
+            token, pending_data = await receive_auth_frame(websocket)
+        except WebSocketDisconnect:
+            return
+    if token:
+        user_id = await run_in_threadpool(authorize_star_user, token, star_id)
+        if user_id is None:
+            await websocket.close(code=1008)
+            return
+    elif CHAT_ALLOW_ANONYMOUS:
+        user_id = None
     else:
-        gpt_input_list = []
-    
-    chat_generation = ChatGeneration(p_data, gpt_input_list)
-    # 현재 채팅 내역 
-    full_message_list = []
+        await websocket.close(code=1008)
+        return
+
+    # p_data, 저장된 요약, 이어갈 최근 대화 (star 문서 한 번 조회)
+    p_data, summary, gpt_input_list = await run_in_threadpool(load_resume_state, star_id)
+    if p_data is None:
+        # 생성 job이 끝나지 않았거나 실패한 star
+        await websocket.close(code=1008)
+        return
+
+    # 고인의 과거 발화 검색 인덱스 (star 생성 시 저장된 경우)
+    # 역직렬화된 인덱스는 프로세스 내 캐시에서 재사용, 로드는 스레드풀에서 실행
+    retrieval_index = await run_in_threadpool(load_retrieval_index, star_id, gpt_message_repo)
+
+    chat_generation = ChatGeneration(p_data, gpt_input_list, retrieval_index, summary)
+    # 응답 음성 미리 합성 (음성이 등록된 star만)
+    voice_star = await run_in_threadpool(load_voice_star, star_id) if TTS_SPECULATIVE else None
+    s3 = get_s3_service(os.getenv("S3_BUCKET"), os.getenv("AWS_ACCESS_KEY_ID"), os.getenv("AWS_SECRET_ACCESS_KEY")) if voice_star else None
+
+    async def record_turn(user_input: str, gpt_response: str):
+        # 턴마다 journal에 기록 (Mongo에는 일괄 저장)
+        await run_in_threadpool(message_journal.record_turn, star_id, user_input, gpt_response)
+        if voice_star is not None:
+            prefetch_voice(voice_star, gpt_response, s3)
     
-    # 연결 수락 및 처리
-    await websocket.accept()
-    await manager.connect(websocket, star_id)
+    session = session_manager.open(websocket, star_id, user_id)
+    session.state_bytes = chat_generation.state_bytes
 
     try:
+        await manager.connect(websocket, star_id, session.session_id)
         sys.setrecursionlimit(10000)
         while True:
-            data = await websocket.receive_text()
+            # 수신 대기 중 heartbeat를 opt-in한 클라이언트에 ping 전송, 응답/활동이 없으면 SessionExpired
+            # (토큰 없이 연결한 이전 클라이언트의 첫 메시지는 인증 대기 중 이미 받음)
+            if pending_data is not None:
+                data, pending_data = pending_data, None
+            else:
+                data = await session.receive()
             try:
                 message_data = json.loads(data)
                 # 메시지 형식 검증
@@ -119,49 +396,108 @@ async def websocket_endpoint(
                 # user의 메시지
                 user_input = message_data['content']
 
-                if detect_crime.detect_voice_phishing_activity(user_input):
-                    response = "의심스러운 메시지가 감지되었습니다. 다시 메시지를 전송해주세요."
+                stream = message_data.get("stream", CHAT_STREAMING)
+
+                # 같은 star에 연결된 다른 기기에도 user 메시지 전달
+                turn_id = uuid.uuid4().hex
+                await manager.send_message("user", user_input, star_id, turn_id, source=session.session_id)
+
+                if CHAT_SPECULATIVE:
+                    gpt_response = await speculative_gpt_answer(chat_generation, user_input, star_id, stream, turn_id)
+                    if gpt_response is not None:
+                        await record_turn(user_input, gpt_response)
+                    continue
+
+                # GPT 호출은 gateway 루프에서 실행되고 여기서는 await만 함 (이벤트 루프/스레드풀을 점유하지 않음)
+                if await detect_crime.detect_voice_phishing_activity(user_input):
+                    response = VOICE_PHISHING_WARNING
+                elif stream:
+                    # 스트리밍 모드: delta를 전송하면서 전체 응답을 조립
+                    gpt_response = await stream_gpt_answer(chat_generation, user_input, star_id, turn_id)
+                    await record_turn(user_input, gpt_response)
+                    continue
                 else:
                     # GPT 모델을 사용하여 응답 생성
                     # gpt 내에서 자동으로 user_input, gpt_response 저장
-                    gpt_response, _ = chat_generation.get_gpt_answer(user_input)
+                    gpt_response, _ = await chat_generation.get_gpt_answer(user_input)
                     response = gpt_response
-                    full_message_list.append({"user_input": user_input,"gpt_response":gpt_response})
+                    await manager.send_message("assistant", response, star_id, turn_id)
+                    await record_turn(user_input, gpt_response)
+                    continue
 
-                await manager.send_message("assistant", response, star_id)
+                await manager.send_message("assistant", response, star_id, turn_id)
 
             except json.JSONDecodeError:
                 logger.error("Error decoding message")
     except WebSocketDisconnect:
         logger.debug(f"WebSocket disconnected for user: {star_id}")
+    except SessionExpired as e:
+        # 유휴/응답 없는 연결: 저장 대기 중인 턴을 바로 저장하고 종료
+        message_journal.request_flush()
+        await session_manager.expire(session, e)
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        await websocket.close(code=1011) 
+    finally:
+        session_manager.close(session)
+        manager.disconnect(websocket)
         
-        for current_message in full_message_list:
-            current_user_input = current_message["user_input"]
-            current_gpt_response = current_message["gpt_response"]
 
-            # 메시지 저장 로직: MessageRepository에 사용자 응답 저장
-            message_repo.save_message(star_id=star_id, sender="user", content=current_user_input)
+# Star 데이터베이스의 gpt_cond_latent, speaker_embedding (.pkl 파일) 조회
+def load_star_voice(star: Star):
+    # 디코딩된 latent는 voice_profile 캐시에서 재사용 (miss일 때만 DB blob 조회)
+    profile = get_voice_profile(star)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Star Voice Not Found")
+    return profile
 
-            # 메시지 저장 로직: MessageRepository에 gpt 응답 저장
-            message_repo.save_message(star_id=star_id, sender="assistant", content=current_gpt_response)
 
-            # GptMessageRepository에 사용자 응답 저장
-            gpt_message_repo.save_gpt_message(star_id=star_id, sender="user", content=current_user_input)
+def user_owns_star(star_id: int, user_id: str) -> bool:
+    session = SeesionFactory()
+    try:
+        return StarRepository(session).is_star_owner(star_id=star_id, user_id=user_id)
+    finally:
+        session.close()
 
-            # GptMessageRepository에 gpt 응답 저장
-            gpt_message_repo.save_gpt_message(star_id=star_id, sender="assistant", content=current_gpt_response)
 
-        manager.disconnect(star_id)
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        await websocket.close(code=1011) 
-        
+def load_voice_star(star_id: int) -> Star | None:
+    session = SeesionFactory()
+    try:
+        star: Star | None = StarRepository(session).get_star(star_id=star_id)
+    finally:
+        session.close()
+
+    # 음성 프로필을 미리 캐시에 올려두고, 음성이 없는 star는 제외
+    if star is None or get_voice_profile(star) is None:
+        return None
+    return star
+
+
+# 합성 요청 함수 (audio_cache가 캐시 miss일 때 우선순위와 함께 호출)
+def make_synthesize(star: Star, text: str, cache_key: str):
+    async def synthesize(priority: int):
+        gpt_cond_latent, speaker_embedding = await run_in_threadpool(load_star_voice, star)
+
+        # XTTS 추론과 인코딩은 별도 프로세스 풀에서 실행 (이벤트 루프를 막지 않음)
+        return await tts_engine.synthesize_encoded(
+            text, gpt_cond_latent, speaker_embedding, audio_cache.audio_format, audio_cache.bitrate,
+            priority=priority, key=cache_key, star_id=star.star_id,
+        )
+    return synthesize
+
+
+# GPT 응답 직후 낮은 우선순위로 음성을 미리 합성하여 캐시에 저장
+def prefetch_voice(star: Star, text: str, s3: S3Service):
+    cache_key = audio_cache.cache_key(star, text)
+    audio_cache.prefetch(star.star_id, cache_key, make_synthesize(star, text, cache_key), s3)
+
 
 # Voice Cloning
 @router.post("/play-voice/{star_id}", status_code=200)
 async def play_voice_handler(
     star_id: int,
     request: PlayVoiceRequest,
+    inline: bool = False, # inline: URL 대신 음성 데이터를 바로 반환
     user: User = Depends(get_authenticated_user),
     star_repo: StarRepository = Depends(),
     s3: S3Service = Depends(get_s3_service),
@@ -173,38 +509,60 @@ async def play_voice_handler(
     if not star:
         raise HTTPException(status_code=404, detail="Star Not Found")
     
-    # Star 데이터베이스의 gpt_cond_latent, speaker_embedding (.pkl 파일) 조회
-    gpt_cond_latent_data = star.gpt_cond_latent_data
-    speaker_embedding_data = star.speaker_embedding_data
-    
-    gpt_cond_latent = pickle.loads(gpt_cond_latent_data)
-    speaker_embedding = pickle.loads(speaker_embedding_data)
-
-    output = inference(
-        voice_cloning_model,
-        text, 
-        gpt_cond_latent, 
-        speaker_embedding
-    )
+    # 같은 텍스트/음성 프로필/추론 파라미터의 합성 결과는 캐시에서 재사용
+    cache_key = audio_cache.cache_key(star, text)
+
+    try:
+        voice_url, voice_data = await audio_cache.get_or_create(
+            star_id, cache_key, make_synthesize(star, text, cache_key), s3, with_data=inline
+        )
+    except TTSQueueFull:
+        raise HTTPException(status_code=503, detail="Voice synthesis queue is full")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Voice synthesis timed out")
+
+    if inline:
+        return Response(content=voice_data, media_type=audio_cache.content_type)
+    return voice_url
+
+
+# Voice Cloning (스트리밍)
+# 문장 단위로 합성되는 대로 16bit PCM(24kHz, mono)을 chunked transfer로 전송
+@router.post("/play-voice/{star_id}/stream", status_code=200)
+async def play_voice_stream_handler(
+    star_id: int,
+    request: PlayVoiceRequest,
+    user: User = Depends(get_authenticated_user),
+    star_repo: StarRepository = Depends(),
+):
+    star: Star | None = star_repo.get_star_by_star_id(star_id=star_id, user_id=user.user_id)
 
-    # local path에 저장
-    torchaudio.save(f'{audio_dir_path}{star_id}.wav', output, 24000)
+    if not star:
+        raise HTTPException(status_code=404, detail="Star Not Found")
 
-    filename = f'{star_id}.wav'
-    local_wav_file_path = f'{audio_dir_path}{filename}'
+    gpt_cond_latent, speaker_embedding = await run_in_threadpool(load_star_voice, star)
 
-    # S3 업로드
-    object_name = f"star/{star_id}/voice/{filename}"
-    s3.upload_audio_file_to_s3(local_wav_file_path, object_name=object_name)
-    voice_url = f"https://{s3.S3_BUCKET}.s3.amazonaws.com/{object_name}"
+    pcm_chunks = tts_engine.stream(request.text, gpt_cond_latent, speaker_embedding)
 
+    # 첫 chunk까지 기다려 대기열 거절/오류는 응답 헤더 전송 전에 처리
     try:
-        if not os.path.exists(local_wav_file_path):
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        os.remove(local_wav_file_path)
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
-
-    return voice_url
+        first_chunk = await pcm_chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except TTSQueueFull:
+        raise HTTPException(status_code=503, detail="Voice synthesis queue is full")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Voice synthesis timed out")
+
+    async def audio_stream():
+        try:
+            yield first_chunk
+            async for chunk in pcm_chunks:
+                yield chunk
+        finally:
+            await pcm_chunks.aclose()
+
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/L16; rate=24000; channels=1",
+    )
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+from service.auth import AuthService
+from security import get_access_token
+
+from database.orm import User
+from database.repository import UserRepository
+from schema.response import JobSchema
+from service.job_queue import job_service
+
+
+router = APIRouter(prefix="/jobs")
+
+
+# 유저 검증 및 조회(공통)
+def get_authenticated_user(
+    access_token: str = Depends(get_access_token),
+    auth_service: AuthService = Depends(),
+    user_repo: UserRepository = Depends(),
+) -> User:
+    return auth_service.verify_user(access_token=access_token, user_repo=user_repo)
+
+
+# 작업 진행 상황 조회
+@router.get("/{job_id}", status_code=200)
+def get_job_handler(
+    job_id: str,
+    user: User = Depends(get_authenticated_user),
+) -> JobSchema:
+
+    job: dict | None = job_service.get_job(job_id)
+
+    if not job or job["user_id"] != user.user_id:
+        raise HTTPException(status_code=404, detail="Job Not Found")
+    return JobSchema(**job)
@@ -1,18 +1,24 @@
 from datetime import date
 import json
-from typing import List, Optional
+from typing import Optional
 from fastapi import Depends, File, Form, HTTPException, APIRouter, UploadFile
+from starlette.concurrency import run_in_threadpool
 from service.s3_service import S3Service, get_s3_service
 from service.auth import AuthService
 from security import get_access_token
 
 from database.orm import Star, User
-from database.repository import UserRepository, StarRepository, MessageRepository, GptMessageRepository
+from database.repository import UserRepository, StarRepository, MessageRepository
 from schema.request import UpdateStarRequest
-from schema.response import StarListSchema, StarSchema
-from service.ai_serving import PromptGeneration, SpeakerIdentification, VoiceCloning
+from schema.response import JobSchema, StarListSchema, StarSchema, StarSummarySchema
+from service.ai_serving import SpeakerIdentification
+from service.job_queue import job_service
+from service.star_jobs import create_star_job, select_voice_job
+from service.voice_profile import voice_profile_cache
 
 from io import BytesIO
+import shutil
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -35,16 +41,13 @@ def get_authenticated_user(
 def get_stars_handler(
     order: str | None = None,
     user: User = Depends(get_authenticated_user),  
+    star_repo: StarRepository = Depends(),
 ) -> StarListSchema:
     
-    stars: List[Star] = user.stars
+    stars = star_repo.get_star_summaries(user_id=user.user_id, descending=order == "DESC")
 
-    if order and order == "DESC":
-        return StarListSchema(
-            stars=[StarSchema.from_orm(star) for star in stars[::-1]]  
-        )
     return StarListSchema(
-        stars=[StarSchema.from_orm(star) for star in stars] 
+        stars=[StarSummarySchema.from_orm(star) for star in stars] 
     )
 
 
@@ -74,7 +77,8 @@ def get_star_handler(
 
 
 # star 생성
-@router.post("", status_code=201)
+# 파싱과 GPT 호출은 job으로 실행하고 job 정보를 즉시 반환 (진행 상황은 GET /jobs/{job_id})
+@router.post("", status_code=202)
 async def create_star_handler(
     star_name: str = Form(...),
     gender: str = Form(...),
@@ -85,8 +89,7 @@ async def create_star_handler(
     original_text_file: UploadFile = File(...),
     user: User = Depends(get_authenticated_user),  
     star_repo: StarRepository = Depends(StarRepository),
-    gptmessage_repo : GptMessageRepository = Depends(GptMessageRepository)
-) -> StarSchema:
+) -> JobSchema:
     
     request = {
         "star_name": star_name,
@@ -96,26 +99,30 @@ async def create_star_handler(
         "relationship": relationship,
         "persona": persona,
     }
-    
-    # Open text file
-    original_text = await original_text_file.read()
-    original_text = original_text.decode("utf-8")
 
-    # Prompt Generation
-    prompt_generator = PromptGeneration(request,original_text)
-    chat_prompt_input_data = prompt_generator.create_prompt_input()
+    # 요청이 끝나면 업로드 파일이 닫히므로 임시 파일로 복사하여 job에 전달
+    await original_text_file.seek(0)
+    text_file_path = await run_in_threadpool(copy_to_temp_file, original_text_file.file)
 
-    # DB Save
+    # DB Save (프롬프트는 job 완료 후 저장)
     star: Star = Star.create(
         request=request, 
-        chat_prompt_input_data=chat_prompt_input_data,
+        chat_prompt_input_data=None,
         user_id=user.user_id
     )  
     star: Star = star_repo.create_star(star=star)
-    
-    gptmessage_repo.save_p_data(star_id=star.star_id, p_data=chat_prompt_input_data)
 
-    return StarSchema.from_orm(star)
+    job = job_service.enqueue(
+        "create_star", user.user_id, create_star_job, star.star_id, request, text_file_path,
+        star_id=star.star_id,
+    )
+    return JobSchema(**job)
+
+
+def copy_to_temp_file(file) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as temp_file:
+        shutil.copyfileobj(file, temp_file)
+    return temp_file.name
 
 
 # star 생성(보이스 업로드)
@@ -139,7 +146,8 @@ def upload_voice_handler(
 
 
 # star 생성(보이스 선택)
-@router.post("/voice-select/{star_id}", status_code=201)
+# 음성 이어붙이기와 XTTS latent 추출은 job으로 실행
+@router.post("/voice-select/{star_id}", status_code=202)
 def upload_voice_handler(
     star_id: int,
     selected_speaker_id: str = Form(...),
@@ -147,31 +155,20 @@ def upload_voice_handler(
     original_voice_base64: str = Form(...),
     user: User = Depends(get_authenticated_user),
     star_repo: StarRepository = Depends(),
-) -> StarSchema:
+) -> JobSchema:
     
     star: Star | None = star_repo.get_star_by_star_id(star_id=star_id, user_id=user.user_id)
     if not star: 
         raise HTTPException(status_code=404, detail="Star Not Found")
     
     speech_list_dict = json.loads(speech_list)
-   
-    speaker_identification = SpeakerIdentification()
-    speaker_identification.save_star_voice(selected_speaker_id, speech_list_dict, original_voice_base64,star_id)
 
-    voice_cloning = VoiceCloning()
-    gpt_cond_latent_pkl, speaker_embedding_pkl = voice_cloning.get_star_voice_vector(
-        star_id=star_id
-    )
-    
-    star: Star = star.insert_npy(
-        gpt_cond_latent_npy=gpt_cond_latent_pkl, 
-        speaker_embedding_npy=speaker_embedding_pkl
+    job = job_service.enqueue(
+        "select_voice", user.user_id, select_voice_job,
+        star_id, user.user_id, selected_speaker_id, speech_list_dict, original_voice_base64,
+        star_id=star_id,
     )
-
-    # DB save
-    star: Star = star_repo.update_star(star=star)
-
-    return StarSchema.from_orm(star)
+    return JobSchema(**job)
 
 
 # star 수정
@@ -237,4 +234,5 @@ def delete_star_handler(
 
     # 기존 SQL 데이터베이스에서 별 삭제
     star_repo.delete_star(star_id=star_id)
+    voice_profile_cache.invalidate(star_id)
 
@@ -147,14 +147,9 @@ def kakao_login_handler(
 @mypage_router.get("", status_code=200)
 def get_user_handler(
     user: User = Depends(get_authenticated_user),
-    user_repo: UserRepository = Depends(),
 ) -> UserSchema:
     
-    user: User = user_repo.get_user_by_user_id(user.user_id)
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User Not Found")
-    
+    # 개인정보 수정 시 캐시가 무효화되므로 인증된 사용자 정보를 그대로 반환
     return UserSchema.from_orm(user)
 
 
@@ -163,6 +158,7 @@ def get_user_handler(
 async def update_user_handler(
     image: UploadFile = File(...),
     user: User = Depends(get_authenticated_user),
+    auth_service: AuthService = Depends(),
     user_repo: UserRepository = Depends(),
     s3: S3Service = Depends(get_s3_service),
 ) -> UserSchema:
@@ -181,6 +177,7 @@ async def update_user_handler(
 
     user: User = user.update(image=image_url)
     user: User = user_repo.update_user(user=user)
+    auth_service.invalidate_user(user.user_id)
     return UserSchema.from_orm(user)
 
 
@@ -193,6 +190,9 @@ def modify_user_password_handler(
     user_repo: UserRepository = Depends()
 ):
     
+    # 인증 캐시의 사용자 객체는 세션에 묶여있지 않으므로 다시 조회하여 수정
+    user: User = user_repo.get_user_by_user_id(user.user_id)
+
     verified: bool = auth_service.verify_password(
         plain_password=request.current_password,
         hash_password=user.password,
@@ -207,6 +207,7 @@ def modify_user_password_handler(
         hashed_password=hashed_password,
     )
     user: User = user_repo.save_user(user=user)
+    auth_service.invalidate_user(user.user_id)
     return UserSchema.from_orm(user)
 
 
@@ -218,6 +219,8 @@ def modify_user_delete_handler(
     auth_service: AuthService = Depends(),
     user_repo: UserRepository = Depends()
 ):
+    user: User = user_repo.get_user_by_user_id(user.user_id)
+
     # 현재 비밀번호 확인
     verified: bool = auth_service.verify_password(
         plain_password=request.current_password,
@@ -229,4 +232,5 @@ def modify_user_delete_handler(
     # 사용자 상태를 업데이트(2로 변경)
     user.update_delete(new_status=2)
     user = user_repo.save_user(user=user) 
+    auth_service.invalidate_user(user.user_id)
     return UserSchema.from_orm(user)
@@ -0,0 +1,48 @@
+import argparse
+
+from database.connection import get_mongo
+from database.repository import MessageBucketStore
+
+# star당 하나의 문서에 $push하던 기존 메시지 배열을 bucket 컬렉션으로 옮김
+#   messages.messages        -> message_buckets
+#   gptmessages.gpt_messages -> gpt_message_buckets (p_data는 gptmessages에 유지)
+# 실행: backend/app 에서 python -m database.migrate_message_buckets [--drop-legacy] [--dry-run]
+# 새 저장 방식으로 배포하기 전에 실행 (이미 bucket이 있는 star는 seq 순서가 꼬이지 않도록 건너뜀)
+
+CHUNK_SIZE = MessageBucketStore.BUCKET_SIZE * 10
+
+
+def migrate_collection(db, legacy_collection: str, legacy_field: str, bucket_collection: str, drop_legacy: bool, dry_run: bool) -> int:
+    store = MessageBucketStore(db, bucket_collection)
+    migrated = 0
+
+    for document in db[legacy_collection].find({legacy_field: {"$exists": True}}, {"star_id": 1, legacy_field: 1}):
+        star_id = document["star_id"]
+        messages = document.get(legacy_field) or []
+
+        if store.collection.find_one({"star_id": star_id}, {"_id": 1}) is not None:
+            print(f"{bucket_collection} star {star_id}: already has buckets, skipped")
+            continue
+
+        if not dry_run:
+            for start in range(0, len(messages), CHUNK_SIZE):
+                store.append(star_id, messages[start:start + CHUNK_SIZE])
+            if drop_legacy:
+                db[legacy_collection].update_one({"_id": document["_id"]}, {"$unset": {legacy_field: ""}})
+
+        migrated += 1
+        print(f"{bucket_collection} star {star_id}: {len(messages)} messages")
+
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drop-legacy", action="store_true", help="옮긴 뒤 기존 배열 필드 삭제")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = get_mongo()
+    message_count = migrate_collection(db, "messages", "messages", "message_buckets", args.drop_legacy, args.dry_run)
+    gpt_message_count = migrate_collection(db, "gptmessages", "gpt_messages", "gpt_message_buckets", args.drop_legacy, args.dry_run)
+    print(f"{'would migrate' if args.dry_run else 'migrated'} messages of {message_count} stars, gpt messages of {gpt_message_count} stars")
@@ -0,0 +1,53 @@
+import argparse
+import pickle
+
+from ai_models.voice_cloning.latent_format import encode_latent, is_legacy_pickle
+from database.connection import SeesionFactory
+from database.repository import StarRepository
+
+# pickle로 저장된 star 음성 latent를 버전이 있는 raw tensor 포맷으로 변환
+# 실행: backend/app 에서 python -m database.migrate_voice_latents [--dtype float16] [--dry-run]
+# 변환 전의 row도 load_latent가 읽을 수 있으므로 서비스 중에 실행해도 됨
+
+
+def migrate(dtype: str, batch_size: int, dry_run: bool) -> int:
+    migrated = 0
+    last_star_id = 0
+    session = SeesionFactory()
+    try:
+        star_repo = StarRepository(session)
+        while True:
+            star_ids = star_repo.get_legacy_voice_star_ids(after_star_id=last_star_id, limit=batch_size)
+            if not star_ids:
+                break
+
+            for star_id in star_ids:
+                last_star_id = star_id
+                voice_data = star_repo.get_star_voice_data(star_id=star_id)
+                if voice_data is None or voice_data[0] is None or voice_data[1] is None:
+                    continue
+
+                latents = []
+                for data in voice_data:
+                    # speaker_embedding만 이미 변환된 경우도 처리
+                    latents.append(encode_latent(pickle.loads(data), dtype) if is_legacy_pickle(data) else data)
+
+                if not dry_run:
+                    star_repo.update_star_voice_data(star_id, latents[0], latents[1])
+                migrated += 1
+                print(f"star {star_id}: {sum(map(len, voice_data))} -> {sum(map(len, latents))} bytes")
+    finally:
+        session.close()
+
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    count = migrate(args.dtype, args.batch_size, args.dry_run)
+    print(f"{'would migrate' if args.dry_run else 'migrated'} {count} stars")
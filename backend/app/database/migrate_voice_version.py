@@ -0,0 +1,65 @@
+import argparse
+
+from sqlalchemy import inspect, text
+
+from database.connection import SeesionFactory, engine
+from database.orm import voice_latent_hash
+from database.repository import StarRepository
+
+# star.voice_version 컬럼을 추가하고, 이미 음성이 있는 star는 현재 latent의 해시로 채움
+# 실행: backend/app 에서 python -m database.migrate_voice_version [--dry-run]
+# 새 음성 프로필 버전으로 배포하기 전에 실행 (create_all은 기존 테이블에 컬럼을 추가하지 않음)
+
+
+def add_column(dry_run: bool) -> bool:
+    columns = {column["name"] for column in inspect(engine).get_columns("star")}
+    if "voice_version" in columns:
+        return False
+    if not dry_run:
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE star ADD COLUMN voice_version VARCHAR(64) NULL"))
+    return True
+
+
+def migrate(batch_size: int, dry_run: bool) -> int:
+    migrated = 0
+    last_star_id = 0
+    session = SeesionFactory()
+    try:
+        star_repo = StarRepository(session)
+        while True:
+            star_ids = star_repo.get_stars_without_voice_version(after_star_id=last_star_id, limit=batch_size)
+            if not star_ids:
+                break
+
+            for star_id in star_ids:
+                last_star_id = star_id
+                voice_data = star_repo.get_star_voice_data(star_id=star_id)
+                if voice_data is None or voice_data[0] is None or voice_data[1] is None:
+                    continue
+
+                voice_version = voice_latent_hash(voice_data[0], voice_data[1])
+                if not dry_run:
+                    star_repo.update_star_voice_version(star_id, voice_version)
+                migrated += 1
+                print(f"star {star_id}: {voice_version}")
+    finally:
+        session.close()
+
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if add_column(args.dry_run):
+        print(f"{'would add' if args.dry_run else 'added'} star.voice_version")
+        if args.dry_run:
+            # 컬럼이 없으면 채울 star를 조회할 수 없음
+            raise SystemExit(0)
+
+    count = migrate(args.batch_size, args.dry_run)
+    print(f"{'would migrate' if args.dry_run else 'migrated'} {count} stars")
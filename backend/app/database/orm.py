@@ -1,12 +1,22 @@
+import hashlib
 import numpy as np
 from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Date, Text, func
 from sqlalchemy.dialects.mysql import MEDIUMBLOB
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import declarative_base, deferred, relationship
 
 from schema.request import UpdateStarRequest
 
 Base = declarative_base()
 
+
+def voice_latent_hash(gpt_cond_latent_data: bytes, speaker_embedding_data: bytes) -> str:
+    digest = hashlib.sha256()
+    for data in (gpt_cond_latent_data, speaker_embedding_data):
+        # 경계가 섞이지 않도록 길이를 함께 넣음
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
 # 별(고인)
 class Star(Base):
     __tablename__ = "star"
@@ -19,9 +29,12 @@ class Star(Base):
     relationship = Column(String(20), nullable=False)
     persona = Column(String(512), nullable=True)
     image = Column(String(512), nullable=True)
-    chat_prompt_input_data = Column(Text, nullable=True)
-    gpt_cond_latent_data = Column(MEDIUMBLOB, nullable=True)
-    speaker_embedding_data = Column(MEDIUMBLOB, nullable=True)
+    # 용량이 큰 프롬프트/음성 latent는 실제로 접근할 때만 조회
+    chat_prompt_input_data = deferred(Column(Text, nullable=True), group="prompt")
+    gpt_cond_latent_data = deferred(Column(MEDIUMBLOB, nullable=True), group="voice")
+    speaker_embedding_data = deferred(Column(MEDIUMBLOB, nullable=True), group="voice")
+    # 음성 프로필 버전: voice-select 시점 latent의 sha256 (이름 변경 등 다른 수정으로는 바뀌지 않음)
+    voice_version = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     user_id = Column(String(50), ForeignKey("user.user_id"))
@@ -50,6 +63,7 @@ class Star(Base):
         ):
         self.gpt_cond_latent_data = gpt_cond_latent_npy
         self.speaker_embedding_data = speaker_embedding_npy
+        self.voice_version = voice_latent_hash(gpt_cond_latent_npy, speaker_embedding_npy)
         return self
         
 
@@ -70,7 +84,8 @@ class User(Base):
     user_status = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    stars = relationship("Star", lazy="joined")
+    # 인증마다 star를 함께 조회하지 않도록 접근할 때만 로드 (목록은 StarRepository.get_star_summaries 사용)
+    stars = relationship("Star", lazy="select", order_by="Star.star_id")
 
     @classmethod
     def create(
@@ -1,9 +1,14 @@
 from typing import List
 from fastapi import Depends
-from sqlalchemy import delete, select
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.orm import Session
 from database.connection import get_db, get_mongo
 import datetime
+import gridfs
+import itertools
+import os
 from database.orm import Star, User, Admin
 
 
@@ -14,12 +19,87 @@ class StarRepository:
     def get_stars(self) -> List[Star]:  
         return list(self.session.scalars(select(Star)))  
 
+    def get_star(self, star_id: int) -> Star | None:
+        return self.session.scalar(select(Star).where(Star.star_id == star_id))
+
     def get_star_by_star_id(self, star_id: int, user_id: str) -> Star | None:
         found_star : Star = self.session.scalar(
             select(Star).where(Star.star_id == star_id, Star.user_id == user_id)
         ) 
         return found_star
 
+    def is_star_owner(self, star_id: int, user_id: str) -> bool:
+        # 컬럼을 불러오지 않고 소유 여부만 확인
+        return self.session.scalar(
+            select(Star.star_id).where(Star.star_id == star_id, Star.user_id == user_id)
+        ) is not None
+
+    def get_star_summaries(self, user_id: str, descending: bool = False):
+        # star 목록용: 프롬프트/음성 latent 없이 목록에 필요한 컬럼만 조회
+        order = Star.star_id.desc() if descending else Star.star_id
+        return list(self.session.execute(
+            select(
+                Star.star_id,
+                Star.star_name,
+                Star.gender,
+                Star.birth,
+                Star.death_date,
+                Star.relationship,
+                Star.persona,
+                Star.image,
+                Star.gpt_cond_latent_data.is_not(None).label("has_voice"),
+            )
+            .where(Star.user_id == user_id)
+            # 생성 job이 끝나지 않은(프롬프트가 없는) star는 제외
+            .where(Star.chat_prompt_input_data.is_not(None))
+            .order_by(order)
+        ))
+
+    def get_star_voice_data(self, star_id: int):
+        # (gpt_cond_latent_data, speaker_embedding_data) 또는 None
+        return self.session.execute(
+            select(Star.gpt_cond_latent_data, Star.speaker_embedding_data).where(Star.star_id == star_id)
+        ).first()
+
+    def get_legacy_voice_star_ids(self, after_star_id: int, limit: int) -> List[int]:
+        # pickle로 저장된 latent가 남아있는 star (blob 첫 바이트로 판별)
+        return list(self.session.scalars(
+            select(Star.star_id)
+            .where(Star.star_id > after_star_id, func.substr(Star.gpt_cond_latent_data, 1, 1) == b"\x80")
+            .order_by(Star.star_id)
+            .limit(limit)
+        ))
+
+    def get_stars_without_voice_version(self, after_star_id: int, limit: int) -> List[int]:
+        # 음성은 있지만 voice_version이 비어있는 star (voice_version 컬럼 추가 전에 음성을 선택한 star)
+        return list(self.session.scalars(
+            select(Star.star_id)
+            .where(Star.star_id > after_star_id, Star.gpt_cond_latent_data.is_not(None), Star.voice_version.is_(None))
+            .order_by(Star.star_id)
+            .limit(limit)
+        ))
+
+    def update_star_voice_version(self, star_id: int, voice_version: str) -> None:
+        self.session.execute(
+            update(Star)
+            .where(Star.star_id == star_id)
+            .values(voice_version=voice_version, updated_at=Star.updated_at)
+        )
+        self.session.commit()
+
+    def update_star_voice_data(self, star_id: int, gpt_cond_latent_data: bytes, speaker_embedding_data: bytes) -> None:
+        # 포맷 변환만 하는 경우: voice_version(음성 프로필 버전)과 updated_at을 유지하여 음성 캐시를 무효화하지 않음
+        self.session.execute(
+            update(Star)
+            .where(Star.star_id == star_id)
+            .values(
+                gpt_cond_latent_data=gpt_cond_latent_data,
+                speaker_embedding_data=speaker_embedding_data,
+                updated_at=Star.updated_at,
+            )
+        )
+        self.session.commit()
+
     def create_star(self, star: Star) -> Star:
         self.session.add(instance=star)  
         self.session.commit()   
@@ -40,11 +120,18 @@ class StarRepository:
         mongo_db = get_mongo()  # MongoDB 커넥션 가져오기
         mongo_db['messages'].delete_many({'star_id': star_id})  # 'messages' 컬렉션에서 해당 star_id의 데이터 삭제
         mongo_db['gptmessages'].delete_many({'star_id': star_id})  # 'gptmessages' 컬렉션에서 해당 star_id의 데이터 삭제
+        MessageBucketStore(mongo_db, 'message_buckets').delete(star_id)  # 채팅 메시지 bucket 삭제
+        MessageBucketStore(mongo_db, 'gpt_message_buckets').delete(star_id)  # GPT 메시지 bucket 삭제
+        GptMessageRepository().delete_retrieval_index(star_id)  # 검색 인덱스 삭제
 
     def update_star_image_url(self, star_id: int, image_url: str) -> None:
         self.session.query(Star).filter(Star.star_id == star_id).update({'image': image_url})
         self.session.commit()
 
+    def update_star_prompt(self, star_id: int, chat_prompt_input_data: str) -> None:
+        self.session.query(Star).filter(Star.star_id == star_id).update({'chat_prompt_input_data': chat_prompt_input_data})
+        self.session.commit()
+
 
 class UserRepository:
     def __init__(self, session: Session = Depends(get_db)):
@@ -76,10 +163,157 @@ class UserRepository:
         return user
 
     
+class MessageBucketStore:
+    # star별 메시지를 고정 크기 bucket 문서로 나누어 저장 (16MB 문서 제한, 큰 문서 재작성 방지)
+    # seq: star별로 1부터 증가하는 메시지 번호, bucket_seq = (seq - 1) // BUCKET_SIZE
+    BUCKET_SIZE = int(os.getenv("MESSAGE_BUCKET_SIZE", 200))
+    indexed_collections = set()
+
+    def __init__(self, db, collection_name: str):
+        self.collection = db[collection_name]
+        self.counters_collection = db['message_counters']
+        self.counter_field = collection_name
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        # 프로세스당 한 번만 생성
+        if self.collection.name in MessageBucketStore.indexed_collections:
+            return
+        self.collection.create_index([("star_id", ASCENDING), ("bucket_seq", ASCENDING)], unique=True)
+        self.collection.create_index([("star_id", ASCENDING), ("created_at", ASCENDING)])
+        MessageBucketStore.indexed_collections.add(self.collection.name)
+
+    def bucket_seq(self, seq: int) -> int:
+        return (seq - 1) // self.BUCKET_SIZE
+
+    def reserve_seq(self, star_id, count: int) -> int:
+        # count개의 seq를 한 번에 할당하고 첫 번째 seq 반환
+        counter = self.counters_collection.find_one_and_update(
+            {"_id": star_id},
+            {"$inc": {self.counter_field: count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter[self.counter_field] - count + 1
+
+    def append(self, star_id, messages: List[dict]) -> List[dict]:
+        return self.append_many({star_id: messages})[star_id]
+
+    def append_many(self, messages_by_star: dict) -> dict:
+        # 여러 star의 메시지를 bulk_write 한 번으로 저장 (star별 seq 할당은 star마다 한 번)
+        stored_by_star = {}
+        for star_id, messages in messages_by_star.items():
+            if not messages:
+                stored_by_star[star_id] = []
+                continue
+
+            first_seq = self.reserve_seq(star_id, len(messages))
+            stored_by_star[star_id] = [{**message, "seq": first_seq + i} for i, message in enumerate(messages)]
+
+        self.write_stored(stored_by_star)
+        return stored_by_star
+
+    WRITE_ATTEMPTS = 3
+
+    def write_stored(self, stored_by_star: dict) -> None:
+        # seq가 할당된 메시지 저장, 같은 메시지를 다시 써도 중복되지 않음 (실패 후 재시도용)
+        # 저장된 seq를 먼저 읽어 빠진 메시지만 bucket마다 $push $each 한 번 (문서 단위로 원자적)
+        # upsert 조건은 (star_id, bucket_seq) 동등 조건만 사용 (동시에 같은 bucket을 만들 때 서버가 재시도)
+        for attempt in range(self.WRITE_ATTEMPTS):
+            operations = self.missing_operations(stored_by_star)
+            if not operations:
+                return
+            try:
+                self.collection.bulk_write(operations, ordered=False)
+                return
+            except BulkWriteError as e:
+                # 중복 key(11000)는 다른 worker가 같은 bucket을 먼저 만든 경우, 다시 읽어 빠진 메시지만 다시 씀
+                if e.details.get("writeConcernErrors") or any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+                if attempt == self.WRITE_ATTEMPTS - 1:
+                    if self.missing_operations(stored_by_star):
+                        raise
+                    return
+
+    def stored_seqs(self, star_id, bucket_seqs: List[int]) -> set:
+        buckets = self.collection.find(
+            {"star_id": star_id, "bucket_seq": {"$in": bucket_seqs}}, {"_id": 0, "messages.seq": 1}
+        )
+        return {message["seq"] for bucket in buckets for message in bucket.get("messages", [])}
+
+    def missing_operations(self, stored_by_star: dict) -> list:
+        operations = []
+        for star_id, stored in stored_by_star.items():
+            if not stored:
+                continue
+            stored_seqs = self.stored_seqs(star_id, sorted({self.bucket_seq(message["seq"]) for message in stored}))
+            missing = sorted(
+                (message for message in stored if message["seq"] not in stored_seqs),
+                key=lambda message: message["seq"],
+            )
+            for bucket_seq, group in itertools.groupby(missing, key=lambda message: self.bucket_seq(message["seq"])):
+                group = list(group)
+                update = {
+                    "$push": {"messages": {"$each": group}},
+                    "$inc": {"count": len(group)},
+                    "$min": {"first_seq": group[0]["seq"]},
+                    "$max": {"last_seq": group[-1]["seq"]},
+                }
+                if group[0].get("created_at") is not None:
+                    update["$min"]["created_at"] = group[0]["created_at"]
+                    update["$max"]["updated_at"] = group[-1]["created_at"]
+                operations.append(UpdateOne({"star_id": star_id, "bucket_seq": bucket_seq}, update, upsert=True))
+        return operations
+
+    def tail(self, star_id, limit: int) -> List[dict]:
+        # 최신 메시지부터 limit개
+        return self.page(star_id, limit)
+
+    def page(self, star_id, limit: int, before_seq: int | None = None, after_seq: int | None = None) -> List[dict]:
+        # before_seq: 그보다 오래된 메시지를 최신순으로 / after_seq: 그 이후 메시지를 시간순으로
+        # (star_id, bucket_seq) 인덱스 범위 조회, limit개를 모으거나 범위가 끝날 때까지 bucket을 읽음
+        # (쓰기 실패 등으로 할당만 되고 저장되지 않은 seq가 있으면 bucket이 가득 차 있지 않을 수 있음)
+        if limit <= 0:
+            return []
+
+        query = {"star_id": star_id}
+        if after_seq is not None:
+            query["bucket_seq"] = {"$gte": self.bucket_seq(after_seq + 1)}
+            direction = ASCENDING
+        else:
+            if before_seq is not None:
+                if before_seq <= 1:
+                    return []
+                query["bucket_seq"] = {"$lte": self.bucket_seq(before_seq - 1)}
+            direction = DESCENDING
+
+        # 첫 batch는 bucket이 가득 찬 경우에 필요한 만큼, 부족하면 cursor가 다음 batch를 가져옴
+        buckets = self.collection.find(
+            query, {"_id": 0, "messages": 1}
+        ).sort("bucket_seq", direction).batch_size(limit // self.BUCKET_SIZE + 2)
+
+        messages = []
+        for bucket in buckets:
+            bucket_messages = [
+                message for message in bucket["messages"]
+                if (after_seq is None or message["seq"] > after_seq)
+                and (before_seq is None or message["seq"] < before_seq)
+            ]
+            # 동시에 쓴 경우 배열 순서가 seq 순서와 다를 수 있음
+            messages.extend(sorted(bucket_messages, key=lambda message: message["seq"], reverse=direction == DESCENDING))
+            if len(messages) >= limit:
+                break
+        return messages[:limit]
+
+    def delete(self, star_id) -> None:
+        self.collection.delete_many({"star_id": star_id})
+        self.counters_collection.update_one({"_id": star_id}, {"$unset": {self.counter_field: ""}})
+
+
 class MessageRepository:
     def __init__(self):
         self.db = get_mongo()
-        self.messages_collection = self.db['messages']
+        self.message_buckets = MessageBucketStore(self.db, 'message_buckets')
 
     def save_message(self, star_id, sender, content):
         message = {
@@ -88,38 +322,36 @@ class MessageRepository:
             "created_at": datetime.datetime.utcnow() + datetime.timedelta(hours=9)
         }
         
-        # 해당 star_id의 문서를 찾고, 메시지 배열에 새 메시지를 추가
-        result = self.messages_collection.update_one(
-            {"star_id": star_id},
-            {"$push": {"messages": message}},
-            upsert=True
-        )
-        return result
+        # star_id의 마지막 bucket에 메시지 추가
+        return self.message_buckets.append(star_id, [message])[0]
+
+    def save_messages(self, messages_by_star: dict) -> None:
+        # {star_id: [message, ...]} 한 번에 저장 (message_journal에서 사용)
+        self.message_buckets.append_many(messages_by_star)
 
     def get_last_message(self, star_id):
-        result = self.messages_collection.find_one(
-            {"star_id": star_id},
-            {"messages": {"$slice": -1}}  # 마지막 메시지만 가져오기
-        )
-        if result and 'messages' in result and len(result['messages']) > 0:
-            return result['messages'][0]  # 마지막 메시지 반환
+        messages = self.message_buckets.tail(star_id, 1)
+        if messages:
+            return messages[0]  # 마지막 메시지 반환
         return None
     
     def get_messages(self, star_id: int, limit: int) -> List[dict]:
-        messages = self.messages_collection.aggregate([
-            {"$match": {"star_id": star_id}},
-            {"$unwind": "$messages"},
-            {"$sort": {"messages.created_at": -1}},
-            {"$limit": limit},
-            {"$project": {"messages": 1}}
-        ])
-        return [msg["messages"] for msg in messages]
+        # 최신순
+        return self.message_buckets.tail(star_id, limit)
+
+    def get_messages_page(self, star_id: int, limit: int, before_seq: int | None = None, after_seq: int | None = None) -> List[dict]:
+        # seq는 created_at 순서대로 할당되므로 (created_at, seq) 순서와 같음
+        return self.message_buckets.page(star_id, limit, before_seq=before_seq, after_seq=after_seq)
     
 
 class GptMessageRepository:
+    # star 문서에 보관하는 최근 GPT 입력 메시지 수
+    RECENT_MESSAGES = int(os.getenv("CHAT_RESUME_MAX_MESSAGES", 40))
+
     def __init__(self):
         self.db = get_mongo()
         self.gpt_messages_collection = self.db['gptmessages']
+        self.gpt_message_buckets = MessageBucketStore(self.db, 'gpt_message_buckets')
     
     def save_p_data(self, star_id, p_data):
         result = self.gpt_messages_collection.update_one(
@@ -129,38 +361,128 @@ class GptMessageRepository:
         )
         return result
 
-    def get_gpt_message(self, star_id):
-        # 'gpt_messages' 컬렉션에서 데이터 검색
-        document = self.gpt_messages_collection.find_one({"star_id": star_id})
-        if document and "gpt_messages" in document:
-            return document["gpt_messages"]
-        return []    
+    def get_gpt_messages(self, star_id, limit: int) -> List[dict]:
+        # 최근 limit개의 GPT 입력 메시지 (시간순, 마지막 bucket만 조회)
+        messages = self.gpt_message_buckets.tail(star_id, limit)[::-1]
+        return [{"role": message["role"], "content": message["content"], "seq": message["seq"]} for message in messages]
+
+    def get_gpt_messages_after(self, star_id, after_seq: int, limit: int) -> List[dict]:
+        # after_seq 이후의 GPT 입력 메시지 limit개 (시간순, 요약 갱신용)
+        messages = self.gpt_message_buckets.page(star_id, limit, after_seq=after_seq)
+        return [{"role": message["role"], "content": message["content"], "seq": message["seq"]} for message in messages]
+
+    def push_recent_messages(self, stored_by_star: dict) -> None:
+        # 재연결 시 한 번의 조회로 대화를 이어가도록 star 문서(p_data 저장 시 생성)에 최근 메시지를 고정 개수만 보관
+        # 재시도로 같은 메시지를 다시 쓰는 경우 첫 seq가 이미 있으면 건너뜀
+        operations = [
+            UpdateOne(
+                {"star_id": star_id, "recent_messages.seq": {"$ne": messages[0]["seq"]}},
+                {"$push": {"recent_messages": {
+                    "$each": [{"role": message["role"], "content": message["content"], "seq": message["seq"]} for message in messages],
+                    "$slice": -self.RECENT_MESSAGES,
+                }}},
+            )
+            for star_id, messages in stored_by_star.items() if messages
+        ]
+        if operations:
+            self.gpt_messages_collection.bulk_write(operations, ordered=False)
+
+    def get_resume_state(self, star_id) -> dict | None:
+        # p_data, 롤링 요약, 최근 메시지를 한 번에 조회
+        return self.gpt_messages_collection.find_one(
+            {"star_id": star_id},
+            {
+                "_id": 0,
+                "p_data": 1,
+                "summary": 1,
+                "summary_through_seq": 1,
+                "recent_messages": {"$slice": -self.RECENT_MESSAGES},
+            },
+        )
+
+    def save_summary(self, star_id, summary: str, through_seq: int) -> None:
+        # through_seq까지의 대화 요약 (더 최신 요약이 이미 저장된 경우는 무시)
+        self.gpt_messages_collection.update_one(
+            {
+                "star_id": star_id,
+                "$or": [{"summary_through_seq": {"$exists": False}}, {"summary_through_seq": {"$lt": through_seq}}],
+            },
+            {"$set": {
+                "summary": summary,
+                "summary_through_seq": through_seq,
+                "summary_updated_at": datetime.datetime.utcnow() + datetime.timedelta(hours=9),
+            }},
+        )
     
     def get_p_data(self, star_id):
-        document = self.gpt_messages_collection.find_one({"star_id": star_id})
+        document = self.gpt_messages_collection.find_one({"star_id": star_id}, {"_id": 0, "p_data": 1})
         if document and "p_data" in document:
             return document["p_data"]
         return None
+
+    def save_retrieval_index(self, star_id, index_data: bytes):
+        # 16MB 문서 제한을 피하기 위해 GridFS에 저장하고, 이전 버전은 삭제
+        fs = gridfs.GridFS(self.db, collection="retrieval_index")
+        previous_files = list(fs.find({"star_id": star_id}))
+        fs.put(index_data, filename=str(star_id), star_id=star_id)
+        for previous_file in previous_files:
+            fs.delete(previous_file._id)
+
+    def get_retrieval_index_version(self, star_id):
+        # 최신 인덱스 파일의 _id (files 문서만 조회, chunk는 읽지 않음)
+        index_file = self.db["retrieval_index.files"].find_one(
+            {"star_id": star_id}, {"_id": 1}, sort=[("uploadDate", -1)]
+        )
+        return index_file["_id"] if index_file else None
+
+    def get_retrieval_index(self, star_id, file_id=None) -> bytes | None:
+        # file_id: get_retrieval_index_version으로 확인한 파일 (없으면 최신 파일)
+        fs = gridfs.GridFS(self.db, collection="retrieval_index")
+        query = {"star_id": star_id} if file_id is None else {"_id": file_id}
+        index_file = fs.find_one(query, sort=[("uploadDate", -1)])
+        if index_file is None:
+            return None
+        return index_file.read()
+
+    def delete_retrieval_index(self, star_id):
+        fs = gridfs.GridFS(self.db, collection="retrieval_index")
+        for index_file in fs.find({"star_id": star_id}):
+            fs.delete(index_file._id)
     
     def save_gpt_message(self, star_id, sender, content):
         gpt_message = {
             "role": sender,
-            "content": content
+            "content": content,
+            "created_at": datetime.datetime.utcnow() + datetime.timedelta(hours=9)
         }
         
-        # 해당 star_id의 문서를 찾고, 메시지 배열에 새 메시지를 추가
-        result = self.gpt_messages_collection.update_one(
-            {"star_id": star_id},
-            {"$push": {"gpt_messages": gpt_message}},
-            upsert=True
-        )
-        return result
-    
-    def get_gpt_message(self, gpt_data_id):
-       # 'gpt_messages' 컬렉션에서 데이터 검색
-        return self.messages_collection.find_one({"gpt_data_id": gpt_data_id})
+        # star_id의 마지막 bucket에 메시지 추가
+        return self.gpt_message_buckets.append(star_id, [gpt_message])[0]
+
+    def save_gpt_messages(self, messages_by_star: dict) -> dict:
+        # {star_id: [gpt_message, ...]} 한 번에 저장 (message_journal에서 사용)
+        return self.gpt_message_buckets.append_many(messages_by_star)
     
 
+class JobRepository:
+    def __init__(self):
+        self.db = get_mongo()
+        self.jobs_collection = self.db['jobs']
+
+    def save_job(self, job: dict) -> dict:
+        self.jobs_collection.insert_one(dict(job))
+        return job
+
+    def update_job(self, job_id: str, **fields) -> None:
+        self.jobs_collection.update_one({"job_id": job_id}, {"$set": fields})
+
+    def get_job(self, job_id: str) -> dict | None:
+        return self.jobs_collection.find_one({"job_id": job_id}, {"_id": 0})
+
+    def get_unfinished_jobs(self) -> list:
+        return list(self.jobs_collection.find({"status": {"$in": ["queued", "running"]}}, {"_id": 0}))
+
+
 class AdminRepository:
     def __init__(self, session: Session = Depends(get_db)):
         self.session = session
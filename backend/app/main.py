@@ -5,7 +5,12 @@ from database.connection import engine
 from database.orm import Base
 import os
 
-from api import star, user, chat, admin
+from api import star, user, chat, admin, job
+from service.chat_broker import chat_fanout
+from service.llm_gateway import llm_gateway
+from service.message_journal import message_journal
+from service.star_jobs import recover_interrupted_jobs
+from service.tts_engine import tts_engine
 
 load_dotenv()
 
@@ -29,6 +34,45 @@ app.include_router(user.router)
 app.include_router(user.mypage_router)
 app.include_router(chat.router)
 app.include_router(admin.router)
+app.include_router(job.router)
+
+@app.on_event("startup")
+def recover_star_jobs():
+    # 재시작으로 중단된 job을 실패 처리 (생성 중이던 star 삭제)
+    recover_interrupted_jobs()
+
+
+@app.on_event("startup")
+async def start_tts_engine():
+    # worker 풀과 스트리밍용 Manager 프로세스를 요청을 받기 전에 생성
+    tts_engine.start()
+
+
+@app.on_event("startup")
+def start_message_journal():
+    # 이전 실행에서 저장하지 못한 채팅 턴 복구 후 주기적 저장 시작
+    message_journal.start()
+
+
+@app.on_event("shutdown")
+def shutdown_tts_engine():
+    tts_engine.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_message_journal():
+    message_journal.shutdown()
+
+
+@app.on_event("shutdown")
+async def shutdown_chat_fanout():
+    await chat_fanout.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_llm_gateway():
+    llm_gateway.shutdown()
+
 
 @app.get("/")
 def get_main_page():
@@ -19,8 +19,23 @@ class StarSchema(BaseModel):
         orm_mode = True
 
 
+class StarSummarySchema(BaseModel):
+    star_id: int
+    star_name: str
+    gender: str
+    birth: date
+    death_date: date
+    relationship: str
+    persona: Optional[str]
+    image: Optional[str]
+    has_voice: bool
+
+    class Config:
+        orm_mode = True
+
+
 class StarListSchema(BaseModel):
-    stars: List[StarSchema]
+    stars: List[StarSummarySchema]
 
 
 class UserSchema(BaseModel):
@@ -40,6 +55,30 @@ class UserSchema(BaseModel):
         orm_mode = True
 
 
+class ChatMessageSchema(BaseModel):
+    sender: str
+    content: str
+    created_at: datetime
+    seq: int
+
+
+class ChatMessagePageSchema(BaseModel):
+    messages: List[ChatMessageSchema]
+    next_cursor: Optional[str]  # 다음 페이지 조회용 (없으면 마지막 페이지)
+
+
+class JobSchema(BaseModel):
+    job_id: str
+    job_type: str
+    star_id: Optional[int]
+    status: str
+    stage: str
+    percent: int
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+
 class JWTResponse(BaseModel):
     access_token: str
     
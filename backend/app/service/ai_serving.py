@@ -1,24 +1,29 @@
 
 import base64
 from dotenv import load_dotenv
-from fastapi import HTTPException
-from openai import OpenAI
+import asyncio
+from collections import deque
 import os
 
 from ai_models.voice_cloning.xtts import create_star_vector, load_model
-from ai_models.text_generation.preprocessing import get_user_name,extract_messages
-from ai_models.text_generation.token_limit import load_text_from_bottom
-from ai_models.text_generation.characteristic_generation import merge_prompt_text,get_characteristics
-from ai_models.text_generation.chat_generation import insert_persona_to_prompt,merge_prompt_input,get_response,prepare_chat
+from ai_models.voice_cloning.latent_format import encode_latent
+from ai_models.text_generation.preprocessing import iter_text_lines,parse_kakao_export
+from ai_models.text_generation.token_limit import load_text_from_bottom, TokenBudgeter, TokenTail, iter_encoded_lines
+from ai_models.text_generation.characteristic_generation import merge_prompt_text,get_characteristics,map_reduce_characteristics,CharacteristicCache,ChunkSampler
+from ai_models.text_generation.chat_generation import build_system_prompt,get_response_async,get_response_stream_async,prepare_chat,summarize_messages
 from ai_models.speaker_identification.clova_speech import ClovaSpeechClient
 from ai_models.speaker_identification.postprocessing import speaker_diarization
-from ai_models.text_generation.crime_prevention import detect_voice_phishing
+from ai_models.text_generation.crime_prevention import detect_voice_phishing_async
+from ai_models.text_generation.crime_filter import CrimeFilter
+from ai_models.text_generation.context_window import ContextWindow
+from ai_models.text_generation.retrieval import UtteranceIndex
+from ai_models.text_generation.prompt_template import prompt_templates
+from service.llm_gateway import llm_gateway
 
 import json
 from io import BytesIO
 import base64
 from pydub import AudioSegment
-import pickle
 
 load_dotenv()
 
@@ -29,42 +34,103 @@ voice_cloning_model = load_model(VOICE_CLONING_MODEL_PATH)
 
 ### Load GPT ###
 class PromptGeneration:
-    API_KEY = os.getenv("GPT_API_KEY")
-    client = OpenAI(api_key=API_KEY)
-
-    def __init__(self, request,original_text) -> None:
-
-        self.original_text = original_text
+    # OpenAI 호출은 프로세스 공용 gateway 사용 (커넥션 풀, 재시도, circuit breaker)
+    llm = llm_gateway
+
+    # single: 최근 12k 토큰으로 한 번 추출 / map_reduce: 전체 대화를 구간별로 추출 후 병합
+    CHARACTERISTIC_MODE = os.getenv("CHARACTERISTIC_MODE", "single")
+    CHARACTERISTIC_CONCURRENCY = int(os.getenv("CHARACTERISTIC_CONCURRENCY", 4))
+    # map_reduce에서 추출에 쓰는 12k 토큰 구간 수 상한 (대화 전체에서 고르게 선택)
+    CHARACTERISTIC_MAX_CHUNKS = int(os.getenv("CHARACTERISTIC_MAX_CHUNKS", 16))
+    REDUCE_PROMPT_FILE_PATH = os.getenv(
+        "REDUCE_PROMPT_FILE_PATH",
+        os.path.join(os.path.dirname(__file__), "..", "ai_models", "text_generation", "prompt_data", "reduce_characteristic.txt"),
+    )
+    characteristic_cache = CharacteristicCache(
+        os.getenv("CHARACTERISTIC_CACHE_DIR"),
+        int(os.getenv("CHARACTERISTIC_CACHE_SIZE", 1024)),
+        int(os.getenv("CHARACTERISTIC_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    )
+
+    # 검색 인덱스 사용 시 system 프롬프트에는 짧은 최근 대화만 포함
+    RETRIEVAL_CONTEXT = os.getenv("RETRIEVAL_CONTEXT", "false").lower() == "true"
+    RETRIEVAL_TAIL_TOKEN = int(os.getenv("RETRIEVAL_TAIL_TOKEN", 1000))
+    # 검색 인덱스에 넣는 최근 발화 수 상한
+    RETRIEVAL_MAX_UTTERANCES = int(os.getenv("RETRIEVAL_MAX_UTTERANCES", 50000))
+
+    def __init__(self, request,original_text_file) -> None:
+
+        # 업로드된 대화 파일 (binary file object), 전체를 읽지 않고 스트리밍으로 파싱
+        self.original_text_file = original_text_file
         self.star_gender = request["gender"]
         self.star_name = request["star_name"]
         self.persona = request["persona"]
         self.relationship = request["relationship"]
 
-        self.API_KEY = os.getenv("GPT_API_KEY")
-        self.client = OpenAI(api_key=self.API_KEY)
-
         self.prompt_file_path = os.getenv("PROMPT_FILE_PATH")
         self.system_input_path = os.getenv("SYSTEM_INPUT_PATH")
 
-    def create_prompt_input(self) -> str:
+    def create_prompt_input(self, report=None) -> str:
+        # report(stage, percent): 작업 진행 상황 기록 (job worker에서 사용)
+        report = report or (lambda stage, percent: None)
                
-        user_name = get_user_name(self.original_text)
+        report("parsing", 10)
+        user_name, records = parse_kakao_export(iter_text_lines(self.original_text_file))
         print("user_name : ", user_name)
-        star_text = extract_messages(self.original_text, user_name)
-      
-        star_text_12k = load_text_from_bottom(star_text, 12000,'gpt3.5')
-        star_text_4k = load_text_from_bottom(star_text, 4000,'gpt4')
+        tail_token = self.RETRIEVAL_TAIL_TOKEN if self.RETRIEVAL_CONTEXT else 4000
+
+        # 대화 전체를 한 번만 순회하고, 필요한 만큼만 보관하여 파일 크기와 관계없이 메모리 일정
+        # - 최근 12k/4k 토큰용 tail, map_reduce용 구간 샘플, 검색 인덱스용 최근 발화
+        tail = TokenTail(max(12000, tail_token))
+        chunk_sampler = ChunkSampler(12000, self.CHARACTERISTIC_MAX_CHUNKS) if self.CHARACTERISTIC_MODE == "map_reduce" else None
+        self.retrieval_utterances = deque(maxlen=self.RETRIEVAL_MAX_UTTERANCES) if self.RETRIEVAL_CONTEXT else None
+
+        star_text = (text for _, speaker, text in records if speaker == user_name)
+        for text, tokens in iter_encoded_lines(star_text, 'gpt3.5'):
+            tail.append(text, tokens)
+            if chunk_sampler is not None:
+                chunk_sampler.append(text, tokens)
+            if self.retrieval_utterances is not None:
+                self.retrieval_utterances.append(text)
+
+        # 한 번의 누적합으로 12k, 4k 예산을 모두 처리
+        tail_lines = tail.lines()
+        budgeter = TokenBudgeter(tail_lines, 'gpt3.5')
+        star_text_12k = budgeter.load_text_from_bottom(12000)
+        if budgeter.shares_encoding('gpt4'):
+            star_text_4k = budgeter.load_text_from_bottom(tail_token)
+        else:
+            star_text_4k = load_text_from_bottom(tail_lines, tail_token,'gpt4')
                
         # process for extracting characteristics
-        prompt = merge_prompt_text(star_text_12k,self.prompt_file_path)
-        characteristics = get_characteristics(prompt,self.client)
+        report("extracting_characteristics", 30)
+        if chunk_sampler is not None:
+            characteristics = asyncio.run(self.get_characteristics_map_reduce(chunk_sampler.chunks()))
+        else:
+            prompt = merge_prompt_text(star_text_12k,self.prompt_file_path)
+            characteristics = get_characteristics(prompt,self.llm)
         
         # process for preparing system prompt
-        system_input = insert_persona_to_prompt(self.star_name,self.relationship,self.system_input_path)
-        chat_prompt_input_data = merge_prompt_input(characteristics,system_input,star_text_4k)
+        report("building_prompt", 80)
+        chat_prompt_input_data = build_system_prompt(self.star_name,self.relationship,characteristics,star_text_4k,self.system_input_path)
         
         return chat_prompt_input_data
 
+    def build_retrieval_index(self) -> UtteranceIndex:
+        # RETRIEVAL_CONTEXT일 때 create_prompt_input 이후 호출 (파싱 중 보관한 고인의 최근 발화 사용)
+        return UtteranceIndex.build(self.retrieval_utterances or [])
+
+    async def get_characteristics_map_reduce(self, chunks) -> str:
+        # 요청은 gateway 루프에서 실행 (동시 요청 수는 gateway의 모델별 제한도 함께 적용)
+        return await map_reduce_characteristics(
+            chunks,
+            self.prompt_file_path,
+            self.REDUCE_PROMPT_FILE_PATH,
+            self.llm,
+            self.characteristic_cache,
+            concurrency=self.CHARACTERISTIC_CONCURRENCY,
+        )
+
     
 class SpeakerIdentification:
     COMBINED_STAR_VOICE_FILE_PATH = os.getenv("COMBINED_STAR_VOICE_FILE_PATH")
@@ -104,68 +170,141 @@ class SpeakerIdentification:
             
         save_file_path = self.COMBINED_STAR_VOICE_FILE_PATH + f"/{star_id}_combined_voice_file.wav"
         combined_star_voice_file.export(save_file_path, format="wav")
+        return save_file_path
 
 
 class VoiceCloning:
+    # latent 저장 dtype: float32(기본) / float16(용량 절반)
+    LATENT_DTYPE = os.getenv("VOICE_LATENT_DTYPE", "float32")
 
     def get_star_voice_vector(self, star_id: int):
         
         COMBINED_STAR_VOICE_FILE_PATH = os.getenv("COMBINED_STAR_VOICE_FILE_PATH")
         combined_star_voice_file = COMBINED_STAR_VOICE_FILE_PATH + f"/{star_id}_combined_voice_file.wav"
 
+        # 이어붙인 임시 wav는 호출한 쪽(select_voice_job)에서 성공/실패와 관계없이 삭제
         gpt_cond_latent, speaker_embedding = create_star_vector(
             voice_cloning_model, 
             combined_star_voice_file
         )
-
-        try:
-            if not os.path.exists(combined_star_voice_file):
-                raise HTTPException(status_code=404, detail="File not found")
-            
-            os.remove(combined_star_voice_file)
-                
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
         
-        gpt_cond_latent_pkl = pickle.dumps(gpt_cond_latent)
-        speaker_embedding_pkl = pickle.dumps(speaker_embedding)
+        # pickle 대신 버전이 있는 raw tensor 포맷으로 저장 (로드 시 복사 없이 디코딩)
+        gpt_cond_latent_data = encode_latent(gpt_cond_latent, self.LATENT_DTYPE)
+        speaker_embedding_data = encode_latent(speaker_embedding, self.LATENT_DTYPE)
         
-        return gpt_cond_latent_pkl, speaker_embedding_pkl
+        return gpt_cond_latent_data, speaker_embedding_data
     
 
 class ChatGeneration:
-    API_KEY = os.getenv("GPT_API_KEY")
-    client = OpenAI(api_key=API_KEY)
+    llm = llm_gateway
 
-    def __init__(self, p_data, messages):
-        self.messages = messages
-        self.p_data = p_data
+    # system 프롬프트를 포함한 전체 토큰 예산 / 세션당 보관 메시지 수
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", 7000))
+    SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", 200))
+    RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 8))
 
-        self.messages.insert(0,{'role': 'system', 'content': p_data})
+    def __init__(self, p_data, messages, retrieval_index: UtteranceIndex | None = None, summary: str = ""):
+        self.p_data = p_data
+        self.retrieval_index = retrieval_index
 
-    def get_gpt_answer(self,user_input):
-        self.messages.append({'role': 'user', 'content': user_input})
-        gpt_answer = get_response(self.client,self.messages)
-        self.messages.append({'role': 'assistant', 'content': gpt_answer})
+        self.context = ContextWindow(
+            system_prompt=p_data,
+            token_budget=self.CONTEXT_TOKEN_BUDGET,
+            max_messages=self.SESSION_MAX_MESSAGES,
+            summarize=lambda summary, folded: summarize_messages(self.llm, summary, folded),
+        )
+        if summary:
+            self.context.set_summary(summary)
+        for message in messages:
+            self.context.append({'role': message['role'], 'content': message['content']})
+
+    @property
+    def messages(self):
+        return self.context.messages
+
+    def build_messages(self, user_input):
+        # 대화 내역을 변경하지 않고 이번 턴의 요청 메시지 구성
+        # 검색 결과와 이번 입력의 토큰만큼 대화 내역을 줄여 전체가 예산을 넘지 않도록 함
+        extra_messages = []
+        if self.retrieval_index is not None:
+            # 이번 입력과 관련된 고인의 과거 발화만 참고용으로 추가 (대화 내역에는 저장하지 않음)
+            utterances = self.retrieval_index.search(user_input, self.RETRIEVAL_TOP_K)
+            if utterances:
+                reference = '\n'.join(utterances)
+                extra_messages.append({'role': 'system', 'content': f"[관련된 과거 대화]\n{reference}"})
+        extra_messages.append({'role': 'user', 'content': user_input})
+        return self.context.build(extra_messages)
+
+    def state_bytes(self):
+        # 세션 메모리 집계용: 보관 중인 대화 내역 크기
+        return sum(len(message['content'].encode('utf-8')) for message in self.messages)
+
+    def commit_turn(self, user_input, gpt_answer):
+        self.context.append({'role': 'user', 'content': user_input})
+        self.context.append({'role': 'assistant', 'content': gpt_answer})
+
+    # 응답 생성은 gateway의 async 인터페이스를 await (WebSocket 핸들러에서 스레드풀을 점유하지 않음)
+    async def get_gpt_answer(self,user_input):
+        gpt_answer = await get_response_async(self.llm,self.build_messages(user_input))
+        self.commit_turn(user_input, gpt_answer)
 
         return gpt_answer, self.messages
+
+    async def generate_answer_stream(self, user_input):
+        # 대화 내역에 저장하지 않고 delta만 반환 (speculative 모드에서 사용, 취소하면 스트림을 닫음)
+        async for delta in get_response_stream_async(self.llm, self.build_messages(user_input)):
+            yield delta
+
+    async def get_gpt_answer_stream(self, user_input):
+        # 응답을 delta 단위로 반환하고, 스트림이 끝까지 소비된 경우에만 대화 내역에 저장
+        answer_chunks = []
+        async for delta in self.generate_answer_stream(user_input):
+            answer_chunks.append(delta)
+            yield delta
+
+        self.commit_turn(user_input, ''.join(answer_chunks))
     
 
 class DetectCrime:
-    API_KEY = os.getenv("GPT_API_KEY")
-    client = OpenAI(api_key=API_KEY)
+    llm = llm_gateway
 
     def __init__(self,voice_phishing_p_data_path):
-        with open(voice_phishing_p_data_path,"r",encoding='utf-8') as f:
-            self.voice_phishing_p_data = f.read()
+        # 프롬프트 파일은 template registry에서 읽음 (파일을 수정하면 재배포 없이 반영)
+        self.voice_phishing_p_data_path = voice_phishing_p_data_path
+        self.prompt_mtime = prompt_templates.get(voice_phishing_p_data_path).mtime
+
+        self.crime_filter = CrimeFilter(
+            short_message_length=int(os.getenv("CRIME_FILTER_SHORT_MESSAGE_LENGTH", 30)),
+            cache_size=int(os.getenv("CRIME_FILTER_CACHE_SIZE", 10000)),
+            cache_ttl=int(os.getenv("CRIME_FILTER_CACHE_TTL", 3600)),
+        )
+
+    @property
+    def voice_phishing_p_data(self):
+        template = prompt_templates.get(self.voice_phishing_p_data_path)
+        if template.mtime != self.prompt_mtime:
+            # 프롬프트가 바뀌면 이전 기준으로 캐시된 판정은 사용하지 않음
+            self.prompt_mtime = template.mtime
+            self.crime_filter.clear()
+        return template.text
 
-    def detect_voice_phishing_activity(self,text_input) -> bool:
+    async def detect_voice_phishing_activity(self,text_input) -> bool:
+        prompt = self.voice_phishing_p_data
 
-        gpt_answer = detect_voice_phishing(self.client,text_input,self.voice_phishing_p_data)
+        # 로컬 키워드 필터 및 판정 캐시에서 결정되면 GPT 호출 생략
+        is_detected = self.crime_filter.lookup(text_input)
+        if is_detected is not None:
+            return is_detected
+
+        gpt_answer = await detect_voice_phishing_async(self.llm,text_input,prompt)
 
         if "Yes" in gpt_answer or "yes" in gpt_answer:
             is_detected = True
         else:
             is_detected = False
 
-        return is_detected
\ No newline at end of file
+        self.crime_filter.store(text_input, is_detected)
+        return is_detected
+
+    def stats(self) -> dict:
+        return {**self.crime_filter.stats(), "prompt_templates": prompt_templates.stats()}
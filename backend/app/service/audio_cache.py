@@ -0,0 +1,224 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+from io import BytesIO
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from ai_models.voice_cloning.audio_encoding import AUDIO_FORMATS
+from ai_models.voice_cloning.xtts import INFERENCE_PARAMS, SAMPLE_RATE
+from database.orm import Star
+from service.tts_engine import tts_engine, TTSQueueFull, PRIORITY_EXPLICIT, PRIORITY_SPECULATIVE
+from service.voice_profile import voice_profile_version
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def make_cache_key(star_id: int, profile_version: str, text: str, params: dict) -> str:
+    payload = json.dumps(
+        {"star_id": star_id, "profile": profile_version, "text": normalize_text(text), "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LocalAudioCache:
+    # 로컬 디스크 LRU (전체 크기가 max_bytes를 넘으면 오래 사용하지 않은 파일부터 삭제)
+    def __init__(self, cache_dir: str, max_bytes: int, extension: str = "wav"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # 재시작 시 기존 파일을 마지막 사용 시간 순서로 복원
+        files = [entry for entry in os.scandir(cache_dir) if entry.is_file() and entry.name.endswith(f".{extension}")]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self.entries[entry.name[:-len(extension) - 1]] = entry.stat().st_size
+            self.total_bytes += entry.stat().st_size
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{self.extension}")
+
+    def contains(self, key: str) -> bool:
+        with self.lock:
+            if key not in self.entries:
+                return False
+            self.entries.move_to_end(key)
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return False
+        return True
+
+    def read(self, key: str) -> bytes | None:
+        try:
+            with open(self.path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+        self.add(key)
+
+    def add(self, key: str) -> None:
+        size = os.path.getsize(self.path(key))
+        with self.lock:
+            self.total_bytes += size - self.entries.get(key, 0)
+            self.entries[key] = size
+            self.entries.move_to_end(key)
+
+            evicted = []
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                evicted_key, evicted_size = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            try:
+                os.remove(self.path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+
+class AudioCache:
+    # 합성 음성 캐시: 로컬 디스크 LRU -> S3 (결정적 key) -> XTTS 합성 순으로 조회
+    # 같은 key의 동시 요청은 하나의 합성 작업을 공유
+    def __init__(self, local: LocalAudioCache, audio_format: str, bitrate: str):
+        self.local = local
+        self.audio_format = audio_format
+        self.bitrate = bitrate
+        self.extension, self.content_type = AUDIO_FORMATS[audio_format]
+        self.in_flight = {}
+        self.counters = {
+            "requests": 0, "local_hits": 0, "s3_hits": 0, "coalesced": 0, "synthesized": 0,
+            "speculative": 0, "speculative_dropped": 0,
+        }
+
+    def object_name(self, star_id: int, key: str) -> str:
+        return f"star/{star_id}/voice/cache/{key}.{self.extension}"
+
+    def cache_key(self, star: Star, text: str) -> str:
+        params = {**INFERENCE_PARAMS, "sample_rate": SAMPLE_RATE, "format": self.audio_format, "bitrate": self.bitrate}
+        return make_cache_key(star.star_id, voice_profile_version(star), text, params)
+
+    async def get_or_create(self, star_id: int, key: str, synthesize, s3, with_data: bool = False) -> tuple[str, bytes | None]:
+        # synthesize(priority): 인코딩된 음성 bytes를 반환하는 coroutine 함수 (캐시 miss일 때만 호출)
+        # (S3 URL, with_data인 경우 음성 bytes) 반환
+        self.counters["requests"] += 1
+        object_name = self.object_name(star_id, key)
+
+        # 로컬에 있는 파일은 이미 S3에 업로드된 것
+        if self.local.contains(key):
+            self.counters["local_hits"] += 1
+            data = await run_in_threadpool(self.local.read, key) if with_data else None
+            if data is not None or not with_data:
+                return s3.get_object_url(object_name), data
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            # speculative 합성이 대기 중이면 재생 요청 우선순위로 올림
+            self.counters["coalesced"] += 1
+            tts_engine.promote(key)
+            try:
+                # 한 요청이 취소되어도 공유 중인 합성 작업은 계속 진행
+                voice_url, data = await asyncio.shield(task)
+            except TTSQueueFull:
+                # speculative 제한으로 거절된 작업에 합류한 경우: 재생 요청 우선순위로 다시 합성
+                # (다른 재생 요청이 이미 다시 시작했다면 그 작업을 공유)
+                task = self.in_flight.get(key)
+                if task is None:
+                    task = self.start(key, object_name, synthesize, s3, PRIORITY_EXPLICIT)
+                voice_url, data = await asyncio.shield(task)
+        else:
+            task = self.start(key, object_name, synthesize, s3, PRIORITY_EXPLICIT)
+            voice_url, data = await asyncio.shield(task)
+
+        if with_data and data is None:
+            data = await run_in_threadpool(s3.download_bytes, object_name)
+        return voice_url, data if with_data else None
+
+    def prefetch(self, star_id: int, key: str, synthesize, s3) -> None:
+        # 응답 직후 낮은 우선순위로 미리 합성 (이미 캐시에 있거나 진행 중이면 무시)
+        if key in self.in_flight or self.local.contains(key):
+            return
+        self.counters["speculative"] += 1
+        task = self.start(key, self.object_name(star_id, key), synthesize, s3, PRIORITY_SPECULATIVE)
+        task.add_done_callback(self.on_prefetch_done)
+
+    def on_prefetch_done(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        error = task.exception()
+        if isinstance(error, TTSQueueFull):
+            self.counters["speculative_dropped"] += 1
+        elif error is not None:
+            logger.error(f"Error prefetching voice: {error}")
+
+    def start(self, key: str, object_name: str, synthesize, s3, priority: int) -> asyncio.Task:
+        task = asyncio.create_task(self.create(key, object_name, synthesize, s3, priority))
+        self.in_flight[key] = task
+        task.add_done_callback(lambda done: self.in_flight.pop(key) if self.in_flight.get(key) is done else None)
+        return task
+
+    async def create(self, key: str, object_name: str, synthesize, s3, priority: int) -> tuple[str, bytes | None]:
+        if await run_in_threadpool(s3.object_exists, object_name):
+            self.counters["s3_hits"] += 1
+            return s3.get_object_url(object_name), None
+
+        data = await synthesize(priority)
+        self.counters["synthesized"] += 1
+
+        await run_in_threadpool(self.save_and_upload, key, object_name, data, s3)
+        return s3.get_object_url(object_name), data
+
+    def save_and_upload(self, key: str, object_name: str, data: bytes, s3) -> None:
+        # 메모리의 bytes를 그대로 S3에 업로드하고, 로컬 캐시에 저장
+        s3.upload_fileobj_to_s3(file_stream=BytesIO(data), object_name=object_name, content_type=self.content_type)
+        self.local.write(key, data)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": len(self.in_flight),
+            "local_entries": len(self.local.entries),
+            "local_bytes": self.local.total_bytes,
+        }
+
+
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "wav")
+
+audio_cache = AudioCache(
+    LocalAudioCache(
+        cache_dir=os.getenv("AUDIO_CACHE_DIR", os.path.join(os.getenv("AUDIO_DIR_PATH") or ".", "cache")),
+        max_bytes=int(os.getenv("AUDIO_CACHE_MAX_BYTES", 1024 * 1024 * 1024)),
+        extension=AUDIO_FORMATS[AUDIO_FORMAT][0],
+    ),
+    audio_format=AUDIO_FORMAT,
+    bitrate=os.getenv("AUDIO_BITRATE", "64k"),
+)
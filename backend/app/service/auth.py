@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 import os
 from database.orm import User, Admin
 from database.repository import UserRepository, AdminRepository
+from service.principal_cache import principal_cache, from_principal, to_principal
 from security import get_access_token
 
 load_dotenv()
@@ -56,12 +57,22 @@ class AuthService:
         # 유저 검증
         user_id: str = self.decode_jwt(access_token=access_token)
 
+        # 캐시된 사용자가 있으면 DB 조회 생략
+        principal: dict | None = principal_cache.get(user_id)
+        if principal is not None:
+            return from_principal(principal)
+
         # 유저 조회
         user: User | None = user_repo.get_user_by_user_id(user_id=user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User Not Found")
         
+        principal_cache.set(user_id, to_principal(user))
         return user
+
+    def invalidate_user(self, user_id: str) -> None:
+        # 비밀번호 변경, 탈퇴, 개인정보 수정 후 호출
+        principal_cache.delete(user_id)
     
     def admin_create_jwt(self, admin_id: str) -> str: 
         return jwt.encode(
@@ -87,11 +98,11 @@ class AuthService:
             admin_repo: AdminRepository = Depends(),
         ) -> Admin:
 
-        # 유저 검증
-        admin_id: str = self.decode_jwt(access_token=access_token)
+        # 관리자 검증
+        admin_id: str = self.admindecode_jwt(access_token=access_token)
 
-        # 유저 조회
-        admin: User | None = admin_repo.get_admin_by_admin_id(adin_id=admin_id)
+        # 관리자 조회
+        admin: Admin | None = admin_repo.get_admin_by_admin_id(admin_id=admin_id)
         if not admin:
             raise HTTPException(status_code=404, detail="User Not Found")
         
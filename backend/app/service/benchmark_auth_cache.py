@@ -0,0 +1,63 @@
+import argparse
+import time
+
+from database.connection import SeesionFactory
+from database.repository import StarRepository, UserRepository
+from schema.response import StarSchema, UserSchema
+from service import auth
+from service.auth import AuthService
+from service.principal_cache import InMemoryPrincipalCache, NullPrincipalCache
+
+# 인증 사용자 캐시 유무에 따른 GET /stars/{star_id}, GET /mypage 처리량 비교
+# MYSQL_URL의 DB에 있는 사용자/star로 요청 핸들러와 같은 순서(세션 생성 -> verify_user -> 조회)로 실행
+# 실행: backend/app 에서 python -m service.benchmark_auth_cache --user-id <user_id> --star-id <star_id>
+
+
+def mypage_request(auth_service: AuthService, access_token: str):
+    session = SeesionFactory()
+    try:
+        user = auth_service.verify_user(access_token=access_token, user_repo=UserRepository(session))
+        return UserSchema.from_orm(user)
+    finally:
+        session.close()
+
+
+def star_request(auth_service: AuthService, access_token: str, star_id: int):
+    session = SeesionFactory()
+    try:
+        user = auth_service.verify_user(access_token=access_token, user_repo=UserRepository(session))
+        star = StarRepository(session).get_star_by_star_id(star_id=star_id, user_id=user.user_id)
+        return StarSchema.from_orm(star)
+    finally:
+        session.close()
+
+
+def measure(request, requests: int) -> float:
+    request()  # warm up (캐시 채우기, 커넥션 풀 생성)
+    started_at = time.perf_counter()
+    for _ in range(requests):
+        request()
+    return requests / (time.perf_counter() - started_at)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--star-id", type=int, required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    auth_service = AuthService()
+    access_token = auth_service.create_jwt(user_id=args.user_id)
+
+    endpoints = {
+        "GET /mypage": lambda: mypage_request(auth_service, access_token),
+        f"GET /stars/{args.star_id}": lambda: star_request(auth_service, access_token, args.star_id),
+    }
+
+    for name, request in endpoints.items():
+        auth.principal_cache = NullPrincipalCache()
+        uncached = measure(request, args.requests)
+        auth.principal_cache = InMemoryPrincipalCache(ttl=30, max_size=100)
+        cached = measure(request, args.requests)
+        print(f"{name:24} no cache {uncached:9.1f} req/s | cache {cached:9.1f} req/s | x{cached / uncached:.2f}")
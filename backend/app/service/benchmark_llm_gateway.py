@@ -0,0 +1,143 @@
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+from service.llm_gateway import LLMGateway
+
+# 로컬 fake OpenAI 서버로 요청마다 클라이언트를 만드는 기존 방식과 공용 gateway의 처리량 비교 (네트워크 불필요)
+# --error-rate로 500 응답을 섞어 재시도/circuit breaker 동작 확인
+# 실행: backend/app 에서 python -m service.benchmark_llm_gateway [--requests 500 --concurrency 32 --latency 0.05]
+
+MODEL = "gpt-3.5-turbo-16k"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # /v1/chat/completions만 지원, latency만큼 기다린 뒤 고정 응답 (stream이면 SSE로 단어마다 전송)
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    error_rate = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+
+        if random.random() < self.error_rate:
+            self.send_json(500, {"error": {"message": "fake server error", "type": "server_error"}})
+            return
+
+        content = "fake response from local server"
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in content.split():
+                self.send_chunk(f"data: {json.dumps(self.completion(body, word + ' ', stream=True))}\n\n")
+            self.send_chunk("data: [DONE]\n\n")
+            self.send_chunk("")
+            return
+
+        self.send_json(200, self.completion(body, content))
+
+    def completion(self, body: dict, content: str, stream: bool = False) -> dict:
+        choice = {"index": 0, "finish_reason": None if stream else "stop"}
+        choice["delta" if stream else "message"] = {"role": "assistant", "content": content}
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk" if stream else "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", MODEL),
+            "choices": [choice],
+        }
+
+    def send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(latency: float, error_rate: float) -> ThreadingHTTPServer:
+    FakeOpenAIHandler.latency = latency
+    FakeOpenAIHandler.error_rate = error_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(request, requests: int, concurrency: int) -> tuple:
+    # (req/s, 실패 수)
+    def call(_):
+        try:
+            request()
+            return True
+        except Exception:
+            return False
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        succeeded = sum(executor.map(call, range(requests)))
+    return requests / (time.perf_counter() - started_at), requests - succeeded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_fake_server(args.latency, args.error_rate)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    messages = [{"role": "user", "content": "안녕"}]
+
+    def per_request_client():
+        # 기존 PromptGeneration: 요청마다 새 클라이언트 (커넥션 재사용 없음)
+        client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+        try:
+            return client.chat.completions.create(model=MODEL, messages=messages).choices[0].message.content
+        finally:
+            client.close()
+
+    gateway = LLMGateway(
+        api_key="fake",
+        base_url=base_url,
+        max_connections=args.concurrency,
+        max_keepalive=args.concurrency,
+        retry_base_delay=0.01,
+        retry_max_delay=0.1,
+        model_concurrency={MODEL: args.concurrency},
+        breaker_reset=1,
+    )
+
+    def gateway_stream():
+        return "".join(gateway.stream_sync(MODEL, messages))
+
+    results = {
+        "per-request client": measure(per_request_client, args.requests, args.concurrency),
+        "gateway": measure(lambda: gateway.complete_sync(MODEL, messages), args.requests, args.concurrency),
+        "gateway (stream)": measure(gateway_stream, args.requests, args.concurrency),
+    }
+    for name, (throughput, failures) in results.items():
+        print(f"{name:20} {throughput:9.1f} req/s | failed {failures}")
+    print(json.dumps(gateway.stats(), indent=2))
+
+    gateway.shutdown()
+    server.shutdown()
@@ -0,0 +1,284 @@
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def star_channel(star_id: int) -> str:
+    return f"star:{star_id}"
+
+
+class ConnectionRegistry:
+    # 이 worker에 연결된 WebSocket 목록 (star마다 여러 기기 허용)
+    # 소켓마다 bounded queue와 전송 task를 두어 느린 소켓이 다른 소켓/채널의 전달을 막지 않도록 함
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.sockets_by_channel = {}
+        self.channels_by_socket = {}
+        self.sources = {}  # websocket -> 세션 id (이벤트의 source와 같으면 전달하지 않음)
+        self.senders = {}  # websocket -> (queue, 전송 task)
+        self.on_sent = None  # on_sent(websocket, nbytes): 전송량 집계용
+        self.on_channels_empty = None  # on_channels_empty(channels): 마지막 소켓이 빠진 채널 (구독 해제용)
+        self.counters = {"dropped_slow": 0, "dropped_broken": 0}
+
+    def register(self, websocket, star_id: int, source: str | None = None) -> list:
+        # 이 worker에서 처음 소켓이 생긴 채널 목록 반환 (구독 시작용)
+        channels = [star_channel(star_id)]
+        self.channels_by_socket[websocket] = channels
+        if source is not None:
+            self.sources[websocket] = source
+        new_channels = [channel for channel in channels if channel not in self.sockets_by_channel]
+        for channel in channels:
+            self.sockets_by_channel.setdefault(channel, set()).add(websocket)
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.senders[websocket] = (queue, asyncio.create_task(self.send_loop(websocket, queue)))
+        return new_channels
+
+    def unregister(self, websocket) -> list:
+        # 마지막 소켓이 빠진 채널 목록 반환
+        sender = self.senders.pop(websocket, None)
+        if sender is not None:
+            sender[1].cancel()
+        self.sources.pop(websocket, None)
+
+        empty_channels = []
+        for channel in self.channels_by_socket.pop(websocket, []):
+            sockets = self.sockets_by_channel.get(channel)
+            if sockets is None:
+                continue
+            sockets.discard(websocket)
+            if not sockets:
+                del self.sockets_by_channel[channel]
+                empty_channels.append(channel)
+        return empty_channels
+
+    def drop(self, websocket) -> None:
+        # 끊어지거나 느린 소켓을 목록에서 제거
+        empty_channels = self.unregister(websocket)
+        if empty_channels and self.on_channels_empty is not None:
+            self.on_channels_empty(empty_channels)
+
+    def sockets(self, channel: str) -> list:
+        return list(self.sockets_by_channel.get(channel, ()))
+
+    async def deliver(self, channel: str, event: dict) -> None:
+        # 소켓별 queue에 넣기만 하고 바로 반환 (전송은 소켓별 task)
+        sockets = self.sockets(channel)
+        if not sockets:
+            return
+        text = json.dumps(event)
+        source = event.get("source")
+        for websocket in sockets:
+            if source is not None and self.sources.get(websocket) == source:
+                continue
+            sender = self.senders.get(websocket)
+            if sender is None:
+                continue
+            try:
+                sender[0].put_nowait(text)
+            except asyncio.QueueFull:
+                # 전송이 계속 밀리는 소켓은 종료 (클라이언트가 다시 연결하여 메시지 조회)
+                logger.debug(f"Dropping slow websocket on {channel}")
+                self.counters["dropped_slow"] += 1
+                self.drop(websocket)
+                asyncio.create_task(self.close_slow(websocket))
+
+    async def send_loop(self, websocket, queue: asyncio.Queue) -> None:
+        while True:
+            text = await queue.get()
+            try:
+                await websocket.send_text(text)
+            except Exception as e:
+                logger.debug(f"Dropping websocket: {e}")
+                self.counters["dropped_broken"] += 1
+                self.drop(websocket)
+                return
+            if self.on_sent is not None:
+                self.on_sent(websocket, len(text.encode("utf-8")))
+
+    async def close_slow(self, websocket) -> None:
+        try:
+            await websocket.close(code=1013, reason="slow consumer")
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "sockets": len(self.channels_by_socket),
+            "stars": len(self.sockets_by_channel),
+            "queued": sum(queue.qsize() for queue, _ in self.senders.values()),
+            **self.counters,
+        }
+
+
+class ChatBroker(ABC):
+    # 채널로 이벤트를 보내는 인터페이스, 구독한 채널에서 수신한 이벤트는 handler(channel, event)로 전달
+    def __init__(self):
+        self.handler = None
+
+    async def start(self, handler) -> None:
+        self.handler = handler
+
+    async def stop(self) -> None:
+        pass
+
+    async def subscribe(self, channel: str) -> None:
+        pass
+
+    async def unsubscribe(self, channel: str) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, event: dict) -> None:
+        pass
+
+
+class InMemoryChatBroker(ChatBroker):
+    # 단일 worker용: 바로 이 worker의 소켓에 전달
+    async def publish(self, channel: str, event: dict) -> None:
+        await self.handler(channel, event)
+
+
+class RedisChatBroker(ChatBroker):
+    # 여러 worker/노드용: Redis pub/sub으로 전달, 각 worker는 자신의 소켓이 있는 채널만 구독
+    # client: redis.asyncio 호환 클라이언트를 직접 전달할 때 (없으면 url로 생성)
+    def __init__(self, url: str | None = None, client=None, prefix: str = "chat:"):
+        super().__init__()
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.pubsub = None
+        self.listener = None
+
+    async def start(self, handler) -> None:
+        await super().start(handler)
+        self.pubsub = self.client.pubsub()
+
+    async def stop(self) -> None:
+        if self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+        if self.pubsub is not None:
+            await self.pubsub.unsubscribe()
+            await self.pubsub.close()
+            self.pubsub = None
+
+    async def subscribe(self, channel: str) -> None:
+        await self.pubsub.subscribe(self.prefix + channel)
+        # pubsub 연결은 첫 구독 때 생성되므로 수신 task도 이때 시작
+        if self.listener is None:
+            self.listener = asyncio.create_task(self.listen())
+
+    async def unsubscribe(self, channel: str) -> None:
+        await self.pubsub.unsubscribe(self.prefix + channel)
+
+    async def publish(self, channel: str, event: dict) -> None:
+        await self.client.publish(self.prefix + channel, json.dumps(event))
+
+    async def listen(self) -> None:
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                await self.handler(channel[len(self.prefix):], json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error handling chat broker message: {e}")
+                await asyncio.sleep(1.0)
+
+
+def create_chat_broker() -> ChatBroker:
+    # CHAT_BROKER_BACKEND: memory(기본, 단일 worker) / redis
+    if os.getenv("CHAT_BROKER_BACKEND", "memory") == "redis":
+        return RedisChatBroker(url=os.getenv("CHAT_BROKER_REDIS_URL", "redis://localhost:6379/0"))
+    return InMemoryChatBroker()
+
+
+class ChatFanout:
+    # 연결 관리 + broker: 이벤트를 채널로 publish하면 그 채널을 구독한 worker에서 해당 채널의 소켓으로 전달
+    # 채널에 이 worker의 첫 소켓이 생기면 구독, 마지막 소켓이 빠지면 구독 해제
+    def __init__(self, broker: ChatBroker, registry: ConnectionRegistry):
+        self.broker = broker
+        self.registry = registry
+        self.registry.on_channels_empty = self.release
+        self.started = False
+        self.start_lock = None
+        self.subscription_lock = None
+        self.subscribed = set()
+
+    async def start(self) -> None:
+        # 이벤트 루프 안에서 처음 사용할 때 시작
+        if self.started:
+            return
+        if self.start_lock is None:
+            self.start_lock = asyncio.Lock()
+            self.subscription_lock = asyncio.Lock()
+        async with self.start_lock:
+            if not self.started:
+                await self.broker.start(self.registry.deliver)
+                self.started = True
+
+    async def stop(self) -> None:
+        if self.started:
+            await self.broker.stop()
+            self.subscribed.clear()
+            self.started = False
+
+    async def sync_subscription(self, channel: str) -> None:
+        # 구독 여부를 현재 소켓 유무에 맞춤 (연결/해제가 겹쳐도 마지막 상태 기준)
+        async with self.subscription_lock:
+            if not self.started:
+                return
+            wanted = bool(self.registry.sockets(channel))
+            if wanted and channel not in self.subscribed:
+                await self.broker.subscribe(channel)
+                self.subscribed.add(channel)
+            elif not wanted and channel in self.subscribed:
+                await self.broker.unsubscribe(channel)
+                self.subscribed.discard(channel)
+
+    async def connect(self, websocket, star_id: int, source: str | None = None) -> None:
+        await self.start()
+        for channel in self.registry.register(websocket, star_id, source):
+            await self.sync_subscription(channel)
+
+    def disconnect(self, websocket) -> None:
+        self.release(self.registry.unregister(websocket))
+
+    def release(self, channels: list) -> None:
+        for channel in channels:
+            asyncio.create_task(self.release_channel(channel))
+
+    async def release_channel(self, channel: str) -> None:
+        try:
+            await self.sync_subscription(channel)
+        except Exception as e:
+            logger.error(f"Error unsubscribing chat channel {channel}: {e}")
+
+    async def publish_to_star(self, star_id: int, event: dict) -> None:
+        await self.broker.publish(star_channel(star_id), event)
+
+    def stats(self) -> dict:
+        return {"backend": type(self.broker).__name__, "subscribed": len(self.subscribed), **self.registry.stats()}
+
+
+chat_fanout = ChatFanout(
+    create_chat_broker(),
+    ConnectionRegistry(queue_size=int(os.getenv("CHAT_SOCKET_QUEUE_SIZE", 256))),
+)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 종료 코드
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class SessionExpired(Exception):
+    def __init__(self, reason: str, code: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.code = code
+
+
+class ChatSession:
+    # WebSocket 하나의 수명 관리: 활동이 없으면 종료
+    # 끊어진 연결 감지는 프로토콜 ping/pong (uvicorn --ws-ping-interval/--ws-ping-timeout)
+    # JSON ping은 {"type": "heartbeat"}(또는 pong)를 보내 opt-in한 클라이언트에만 전송하고 pong 응답 시간 검사
+    def __init__(self, manager: "SessionManager", websocket, star_id: int, user_id: str | None):
+        self.manager = manager
+        self.websocket = websocket
+        self.star_id = star_id
+        self.user_id = user_id
+        self.session_id = uuid.uuid4().hex
+        self.state_bytes = None  # 세션이 메모리에 보관 중인 대화 상태 크기를 반환하는 함수
+
+        now = time.monotonic()
+        self.connected_at = now
+        self.last_seen = now  # pong 포함 마지막 수신
+        self.last_activity = now  # 마지막 채팅 메시지
+        self.ping_sent_at = None
+        self.heartbeat_supported = False  # JSON heartbeat를 opt-in한 클라이언트
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.messages_in = 0
+        self.messages_out = 0
+
+    async def receive(self) -> str:
+        # 다음 채팅 메시지를 반환 (heartbeat/pong은 여기서 처리)
+        while True:
+            try:
+                data = await asyncio.wait_for(self.websocket.receive_text(), timeout=self.manager.ping_interval)
+            except asyncio.TimeoutError:
+                self.check_alive()
+                if self.heartbeat_supported:
+                    await self.ping()
+                continue
+
+            now = time.monotonic()
+            self.last_seen = now
+            self.bytes_in += len(data.encode("utf-8"))
+            if self.is_heartbeat(data):
+                self.heartbeat_supported = True
+                self.ping_sent_at = None
+                continue
+
+            self.messages_in += 1
+            self.last_activity = now
+            return data
+
+    def is_heartbeat(self, data: str) -> bool:
+        if '"pong"' not in data and '"heartbeat"' not in data:
+            return False
+        try:
+            return json.loads(data).get("type") in ("pong", "heartbeat")
+        except (ValueError, AttributeError):
+            return False
+
+    def check_alive(self) -> None:
+        now = time.monotonic()
+        if now - self.last_activity > self.manager.idle_timeout:
+            raise SessionExpired("idle timeout", CLOSE_NORMAL)
+        if (
+            self.heartbeat_supported
+            and self.ping_sent_at is not None
+            and now - self.ping_sent_at > self.manager.pong_timeout
+        ):
+            raise SessionExpired("heartbeat timeout", CLOSE_GOING_AWAY)
+
+    async def ping(self) -> None:
+        if self.ping_sent_at is None:
+            self.ping_sent_at = time.monotonic()
+        text = json.dumps({"type": "ping"})
+        await self.websocket.send_text(text)
+        self.record_sent(len(text))
+
+    def record_sent(self, nbytes: int) -> None:
+        self.bytes_out += nbytes
+        self.messages_out += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "session_id": self.session_id,
+            "star_id": self.star_id,
+            "user_id": self.user_id,
+            "connected_seconds": round(now - self.connected_at, 1),
+            "idle_seconds": round(now - self.last_activity, 1),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "state_bytes": self.state_bytes() if self.state_bytes else 0,
+        }
+
+
+class SessionManager:
+    # worker당 WebSocket 세션 목록, 최대 세션 수를 넘으면 1013(try again later)으로 거절
+    # 세션 수는 open 직전에 확인 (그 사이 다른 연결이 열리면 잠시 초과할 수 있음)
+    def __init__(self, max_sessions: int, ping_interval: float, pong_timeout: float, idle_timeout: float):
+        self.max_sessions = max_sessions
+        self.ping_interval = ping_interval
+        self.pong_timeout = pong_timeout
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.counters = {"opened": 0, "rejected": 0, "idle_closed": 0, "heartbeat_closed": 0}
+        self.closed_bytes_in = 0
+        self.closed_bytes_out = 0
+
+    def is_full(self) -> bool:
+        return len(self.sessions) >= self.max_sessions
+
+    async def reject(self, websocket) -> None:
+        # 연결을 수락한 뒤 종료해야 클라이언트가 종료 코드를 받을 수 있음
+        self.counters["rejected"] += 1
+        await websocket.accept()
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="too many sessions")
+
+    def open(self, websocket, star_id: int, user_id: str | None = None) -> ChatSession:
+        session = ChatSession(self, websocket, star_id, user_id)
+        self.sessions[websocket] = session
+        self.counters["opened"] += 1
+        return session
+
+    def close(self, session: ChatSession) -> None:
+        if self.sessions.pop(session.websocket, None) is not None:
+            self.closed_bytes_in += session.bytes_in
+            self.closed_bytes_out += session.bytes_out
+
+    async def expire(self, session: ChatSession, error: SessionExpired) -> None:
+        self.counters["idle_closed" if error.code == CLOSE_NORMAL else "heartbeat_closed"] += 1
+        logger.debug(f"Closing chat session {session.session_id} for star {session.star_id}: {error.reason}")
+        try:
+            await session.websocket.close(code=error.code, reason=error.reason)
+        except Exception:
+            pass
+
+    def record_sent(self, websocket, nbytes: int) -> None:
+        # broker를 통해 전송된 이벤트 크기 (ConnectionRegistry에서 호출)
+        session = self.sessions.get(websocket)
+        if session is not None:
+            session.record_sent(nbytes)
+
+    def stats(self, top: int = 20) -> dict:
+        sessions = [session.stats() for session in list(self.sessions.values())]
+        return {
+            "live_sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            **self.counters,
+            "bytes_in": self.closed_bytes_in + sum(session["bytes_in"] for session in sessions),
+            "bytes_out": self.closed_bytes_out + sum(session["bytes_out"] for session in sessions),
+            "state_bytes": sum(session["state_bytes"] for session in sessions),
+            "largest_sessions": sorted(sessions, key=lambda session: session["state_bytes"], reverse=True)[:top],
+        }
+
+
+session_manager = SessionManager(
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", 1000)),
+    ping_interval=float(os.getenv("CHAT_PING_INTERVAL", 20)),
+    pong_timeout=float(os.getenv("CHAT_PONG_TIMEOUT", 10)),
+    idle_timeout=float(os.getenv("CHAT_IDLE_TIMEOUT", 600)),
+)
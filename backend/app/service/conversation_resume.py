@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from ai_models.text_generation.chat_generation import summarize_messages
+from ai_models.text_generation.context_window import MESSAGE_TOKEN_OVERHEAD, summary_executor
+from ai_models.text_generation.token_limit import token_count
+from database.repository import GptMessageRepository
+from service.llm_gateway import llm_gateway
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 재연결 시 이어갈 최근 대화 (턴 수, 토큰 예산 중 먼저 닿는 쪽까지)
+RESUME_MAX_TURNS = int(os.getenv("CHAT_RESUME_MAX_TURNS", 10))
+RESUME_TOKEN_BUDGET = int(os.getenv("CHAT_RESUME_TOKEN_BUDGET", 3000))
+# 요약 갱신 시 한 번에 요약하는 메시지 수
+SUMMARY_CHUNK_SIZE = int(os.getenv("CHAT_RESUME_SUMMARY_CHUNK", 100))
+
+
+def select_resume_messages(messages: list, through_seq: int = -1, max_turns: int = RESUME_MAX_TURNS, token_budget: int = RESUME_TOKEN_BUDGET, gpt_version: str = 'gpt4') -> list:
+    # 최신 메시지부터 거슬러 올라가며 턴 수/토큰 예산 안의 메시지만 선택 (요약에 포함된 메시지는 제외)
+    selected = []
+    tokens = 0
+    for message in reversed(messages):
+        if message.get("seq", 0) <= through_seq:
+            break
+        message_tokens = token_count(message["content"] or "", gpt_version) + MESSAGE_TOKEN_OVERHEAD
+        if selected and (tokens + message_tokens > token_budget or len(selected) >= max_turns * 2):
+            break
+        selected.append(message)
+        tokens += message_tokens
+    selected.reverse()
+
+    # user 메시지로 시작하도록 앞쪽의 assistant 응답은 제외
+    while selected and selected[0]["role"] != "user":
+        selected.pop(0)
+    return selected
+
+
+def has_unsummarized_messages(recent_messages: list, messages: list, through_seq: int, recent_limit: int) -> bool:
+    # 요약(through_seq까지)과 이어갈 메시지 사이에 실제로 저장된 대화가 있는지 (seq 차이가 아니라 조회된 메시지로 판단)
+    if not recent_messages:
+        return False
+    until_seq = messages[0]["seq"] if messages else recent_messages[-1]["seq"] + 1
+    if any(through_seq < message["seq"] < until_seq for message in recent_messages):
+        return True
+    # 최근 메시지가 가득 차 있으면 그 이전에도 요약되지 않은 메시지가 있을 수 있음
+    # (없는 경우 갱신 작업이 through_seq를 앞으로 옮기므로 한 번만 확인)
+    return len(recent_messages) >= recent_limit and recent_messages[0]["seq"] > through_seq + 1
+
+
+class SummaryRefresher:
+    # 저장된 요약 이후 ~ 재연결 시 이어갈 메시지 이전 구간을 백그라운드에서 요약에 합침
+    # 같은 worker에서 star마다 하나만 실행, 청크마다 저장하여 중간에 실패해도 진행분은 유지
+    def __init__(self, llm):
+        self.llm = llm
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def schedule(self, star_id: int, summary: str, through_seq: int, until_seq: int) -> None:
+        with self.lock:
+            if star_id in self.refreshing:
+                return
+            self.refreshing.add(star_id)
+        future = summary_executor.submit(self.refresh, star_id, summary, through_seq, until_seq)
+        future.add_done_callback(lambda done: self.on_done(star_id, done))
+
+    def on_done(self, star_id: int, future) -> None:
+        with self.lock:
+            self.refreshing.discard(star_id)
+        if future.exception() is not None:
+            logger.error(f"Error refreshing conversation summary of star {star_id}: {future.exception()}")
+
+    def refresh(self, star_id: int, summary: str, through_seq: int, until_seq: int) -> None:
+        gpt_message_repo = GptMessageRepository()
+        while True:
+            messages = gpt_message_repo.get_gpt_messages_after(star_id, through_seq, SUMMARY_CHUNK_SIZE)
+            messages = [message for message in messages if message["seq"] < until_seq]
+            if not messages:
+                break
+            summary = summarize_messages(self.llm, summary, messages)
+            through_seq = messages[-1]["seq"]
+            gpt_message_repo.save_summary(star_id, summary, through_seq)
+
+        # 남은 구간에 저장된 메시지가 없으면(할당만 되고 저장되지 않은 seq) 요약 범위를 끝까지 표시하여 다시 갱신하지 않도록 함
+        if through_seq < until_seq - 1:
+            gpt_message_repo.save_summary(star_id, summary, until_seq - 1)
+
+
+summary_refresher = SummaryRefresher(llm_gateway)
+
+
+def load_resume_state(star_id: int) -> tuple:
+    # (p_data, summary, messages): star 문서 한 번 조회로 재연결 상태를 구성
+    gpt_message_repo = GptMessageRepository()
+    document = gpt_message_repo.get_resume_state(star_id) or {}
+    p_data = document.get("p_data")
+    summary = document.get("summary") or ""
+    through_seq = document.get("summary_through_seq", -1)
+
+    recent_messages = document.get("recent_messages")
+    if recent_messages is None:
+        # 최근 메시지가 저장되기 전의 star: 마지막 bucket에서 조회
+        recent_messages = gpt_message_repo.get_gpt_messages(star_id, gpt_message_repo.RECENT_MESSAGES)
+
+    messages = select_resume_messages(recent_messages, through_seq)
+    if has_unsummarized_messages(recent_messages, messages, through_seq, gpt_message_repo.RECENT_MESSAGES):
+        # 이번 연결은 기존 요약으로 시작하고, 빠진 대화는 백그라운드에서 요약에 합침
+        until_seq = messages[0]["seq"] if messages else recent_messages[-1]["seq"] + 1
+        summary_refresher.schedule(star_id, summary, through_seq, until_seq)
+
+    return p_data, summary, messages
@@ -0,0 +1,166 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from dotenv import load_dotenv
+
+from database.repository import JobRepository
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    UNFINISHED = (QUEUED, RUNNING)
+
+
+def worker_id() -> str:
+    # job을 실행하는 프로세스 (host:pid)
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def is_interrupted(job: dict) -> bool:
+    # 시작 시 호출: 이 host에서 종료된 프로세스의 job (다른 host의 job은 그 host에서 처리)
+    host, _, pid = (job.get("worker") or "").rpartition(":")
+    if not host:
+        return True
+    if host != socket.gethostname():
+        return False
+    try:
+        pid = int(pid)
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        # 컨테이너 재시작 등으로 같은 pid를 받은 경우
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+class InMemoryJobRepository:
+    # 테스트/단일 프로세스용 작업 상태 저장소 (JobRepository와 같은 인터페이스)
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def save_job(self, job: dict) -> dict:
+        with self.lock:
+            self.jobs[job["job_id"]] = dict(job)
+        return job
+
+    def update_job(self, job_id: str, **fields) -> None:
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def get_job(self, job_id: str) -> dict | None:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_unfinished_jobs(self) -> list:
+        with self.lock:
+            return [dict(job) for job in self.jobs.values() if job["status"] in JobStatus.UNFINISHED]
+
+
+class JobQueue(ABC):
+    # 작업 실행 백엔드 인터페이스
+    @abstractmethod
+    def submit(self, func, *args) -> None:
+        pass
+
+
+class InProcessJobQueue(JobQueue):
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+
+    def submit(self, func, *args) -> None:
+        self.executor.submit(func, *args)
+
+
+class JobService:
+    # 무거운 작업을 큐에 넣고 즉시 job_id를 반환, 진행 상황은 저장소에 기록
+    def __init__(self, job_repo, job_queue: JobQueue):
+        self.job_repo = job_repo
+        self.job_queue = job_queue
+
+    def enqueue(self, job_type: str, user_id: str, func, *args, star_id: int | None = None) -> dict:
+        now = datetime.datetime.utcnow()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "job_type": job_type,
+            "user_id": user_id,
+            "star_id": star_id,
+            "status": JobStatus.QUEUED,
+            "stage": "queued",
+            "percent": 0,
+            "error": None,
+            "worker": worker_id(),
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.job_repo.save_job(job)
+        self.job_queue.submit(self.run, job["job_id"], func, *args)
+        return job
+
+    def report(self, job_id: str, stage: str, percent: int) -> None:
+        self.job_repo.update_job(
+            job_id, stage=stage, percent=percent, updated_at=datetime.datetime.utcnow()
+        )
+
+    def run(self, job_id: str, func, *args) -> None:
+        self.job_repo.update_job(job_id, status=JobStatus.RUNNING, updated_at=datetime.datetime.utcnow())
+        try:
+            func(lambda stage, percent: self.report(job_id, stage, percent), *args)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            self.job_repo.update_job(
+                job_id, status=JobStatus.FAILED, error=str(e), updated_at=datetime.datetime.utcnow()
+            )
+            return
+
+        self.job_repo.update_job(
+            job_id, status=JobStatus.SUCCEEDED, stage="done", percent=100, updated_at=datetime.datetime.utcnow()
+        )
+
+    def get_job(self, job_id: str) -> dict | None:
+        return self.job_repo.get_job(job_id)
+
+    def fail_interrupted_jobs(self) -> list:
+        # 프로세스 종료로 끝나지 못한 job (in-process 큐는 재시작 시 다시 실행되지 않음)
+        interrupted = [job for job in self.job_repo.get_unfinished_jobs() if is_interrupted(job)]
+        for job in interrupted:
+            self.job_repo.update_job(
+                job["job_id"], status=JobStatus.FAILED, error="interrupted by restart", updated_at=datetime.datetime.utcnow()
+            )
+        return interrupted
+
+
+def create_job_service() -> JobService:
+    # JOB_STORE_BACKEND: mongo(기본) / memory
+    if os.getenv("JOB_STORE_BACKEND", "mongo") == "memory":
+        job_repo = InMemoryJobRepository()
+    else:
+        job_repo = JobRepository()
+
+    job_queue = InProcessJobQueue(max_workers=int(os.getenv("JOB_WORKERS", 2)))
+    return JobService(job_repo, job_queue)
+
+
+job_service = create_job_service()
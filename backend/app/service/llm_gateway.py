@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 오류 (연결 실패/타임아웃, 429, 5xx)
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+class LLMUnavailable(Exception):
+    # 연속 실패로 circuit이 열려 호출하지 않음
+    pass
+
+
+class CircuitBreaker:
+    # 연속 failure_threshold번 실패하면 reset_timeout 동안 호출 차단, 이후 한 번 시험 호출하여 성공하면 복구
+    # gateway 이벤트 루프 스레드에서만 사용 (lock 없음)
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.trial or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout or self.trial:
+            return False
+        self.trial = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.trial = False
+
+
+class LLMGateway:
+    # 프로세스당 AsyncOpenAI 클라이언트 하나를 전용 이벤트 루프 스레드에서 사용 (httpx 커넥션 풀 공유)
+    # 모델별 동시 요청 수 제한, 지터를 넣은 지수 백오프 재시도, 모델별 circuit breaker
+    # 동기 코드(스레드풀, job worker)에서는 *_sync, 다른 이벤트 루프에서는 submit/stream_async로 호출
+    def __init__(
+        self,
+        api_key: str | None,
+        base_url: str | None = None,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        timeout: float = 60,
+        connect_timeout: float = 5,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8,
+        model_concurrency: dict | None = None,
+        default_concurrency: int = 16,
+        breaker_failures: int = 5,
+        breaker_reset: float = 30,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.model_concurrency = model_concurrency or {}
+        self.default_concurrency = default_concurrency
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+
+        self.loop = None
+        self.thread = None
+        self.client = None
+        self.start_lock = threading.Lock()
+        self.semaphores = {}
+        self.breakers = {}
+        self.in_flight = {}
+
+        self.counters = {"requests": 0, "completed": 0, "failed": 0, "retries": 0, "rejected": 0}
+        self.latency_ms = deque(maxlen=1000)
+
+    def start(self) -> None:
+        # 처음 사용할 때 시작
+        with self.start_lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self.client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,  # 재시도는 gateway에서 처리
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive),
+                    timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                ),
+            )
+            self.thread = threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True)
+            self.thread.start()
+            self.loop = loop
+
+    def shutdown(self) -> None:
+        with self.start_lock:
+            if self.loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self.client.close(), self.loop).result(timeout=5)
+            except Exception as e:
+                logger.error(f"Error closing LLM client: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+            self.client = None
+            self.semaphores = {}
+
+    def semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self.semaphores:
+            self.semaphores[model] = asyncio.Semaphore(self.model_concurrency.get(model, self.default_concurrency))
+        return self.semaphores[model]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+        return self.breakers[model]
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        # 429의 Retry-After가 있으면 따르고, 없으면 full jitter 지수 백오프
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                return min(float(response.headers.get("retry-after")), self.retry_max_delay)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    async def create(self, model: str, messages: list, **params):
+        # 응답(또는 스트림)을 받을 때까지 재시도, 받은 뒤의 오류는 호출한 쪽에서 처리
+        breaker = self.breaker(model)
+        self.counters["requests"] += 1
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                self.counters["rejected"] += 1
+                raise LLMUnavailable(f"{model} circuit is open")
+            try:
+                response = await self.client.chat.completions.create(model=model, messages=messages, **params)
+            except RETRYABLE_ERRORS as e:
+                breaker.record_failure()
+                if attempt == self.max_retries:
+                    self.counters["failed"] += 1
+                    raise
+                self.counters["retries"] += 1
+                logger.warning(f"Retrying {model} request after error: {e}")
+                await asyncio.sleep(self.retry_delay(attempt, e))
+                continue
+            except openai.APIStatusError:
+                # 요청 오류(4xx): 서버는 응답하고 있으므로 circuit에는 성공으로 기록
+                breaker.record_success()
+                self.counters["failed"] += 1
+                raise
+            except BaseException:
+                # 취소 등: 시험 호출이었다면 다음 호출에서 다시 시험
+                breaker.trial = False
+                self.counters["failed"] += 1
+                raise
+            breaker.record_success()
+            return response
+
+    async def complete(self, model: str, messages: list, **params) -> str:
+        started_at = time.perf_counter()
+        async with self.semaphore(model):
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+            try:
+                response = await self.create(model, messages, **params)
+            finally:
+                self.in_flight[model] -= 1
+        self.counters["completed"] += 1
+        self.latency_ms.append((time.perf_counter() - started_at) * 1000)
+        return response.choices[0].message.content
+
+    async def stream(self, model: str, messages: list, **params):
+        # 토큰 단위 delta를 순서대로 반환, 스트림이 끝날 때까지 동시 요청 수에 포함
+        started_at = time.perf_counter()
+        async with self.semaphore(model):
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+            try:
+                stream = await self.create(model, messages, stream=True, **params)
+                try:
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+                finally:
+                    await stream.response.aclose()
+            finally:
+                self.in_flight[model] -= 1
+        self.counters["completed"] += 1
+        self.latency_ms.append((time.perf_counter() - started_at) * 1000)
+
+    def run(self, coroutine):
+        # 다른 스레드에서 gateway 루프에 코루틴을 실행하고 결과를 기다림
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def submit(self, coroutine):
+        # 다른 이벤트 루프(FastAPI 등)에서 블로킹 없이 기다림
+        self.start()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+    def complete_sync(self, model: str, messages: list, **params) -> str:
+        return self.run(self.complete(model, messages, **params))
+
+    async def stream_async(self, model: str, messages: list, **params):
+        # 다른 이벤트 루프(FastAPI 등)에서 async for로 소비, 스레드를 점유하지 않음
+        # 소비를 중단(break/취소)하면 gateway 루프에서 스트림을 닫아 동시 요청 슬롯을 반환
+        deltas = self.stream(model, messages, **params)
+        try:
+            while True:
+                delta = await self.submit(self.next_delta(deltas))
+                if delta is None:
+                    return
+                yield delta
+        finally:
+            self.close_stream(deltas)
+
+    def stream_sync(self, model: str, messages: list, cancel_event=None, **params):
+        # cancel_event가 설정되면 남은 응답을 받지 않고 연결을 닫음
+        deltas = self.stream(model, messages, **params)
+        try:
+            while cancel_event is None or not cancel_event.is_set():
+                delta = self.run(self.next_delta(deltas))
+                if delta is None:
+                    return
+                yield delta
+        finally:
+            self.close_stream(deltas)
+
+    async def next_delta(self, deltas):
+        try:
+            return await deltas.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def close_stream(self, deltas) -> None:
+        # 닫기만 예약하고 기다리지 않음 (GC가 실행되는 스레드나 이벤트 루프를 막지 않도록)
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(deltas.aclose(), loop)
+
+    def stats(self) -> dict:
+        latency_ms = sorted(self.latency_ms)
+        return {
+            **self.counters,
+            "in_flight": dict(self.in_flight),
+            "circuits": {model: breaker.state for model, breaker in self.breakers.items()},
+            "latency_ms": {
+                "count": len(latency_ms),
+                "p50": round(latency_ms[len(latency_ms) // 2], 1) if latency_ms else None,
+                "p95": round(latency_ms[int(len(latency_ms) * 0.95)], 1) if latency_ms else None,
+            },
+        }
+
+
+def parse_model_concurrency(value: str) -> dict:
+    # "gpt-4-0613=8,gpt-3.5-turbo-16k=16"
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, limit = item.split("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+def create_llm_gateway() -> LLMGateway:
+    # LLM_BASE_URL: 로컬 fake 서버 등 OpenAI 호환 서버 주소 (기본 api.openai.com)
+    return LLMGateway(
+        api_key=os.getenv("GPT_API_KEY"),
+        base_url=os.getenv("LLM_BASE_URL") or None,
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", 100)),
+        max_keepalive=int(os.getenv("LLM_MAX_KEEPALIVE", 20)),
+        timeout=float(os.getenv("LLM_TIMEOUT", 60)),
+        connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", 5)),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", 3)),
+        retry_base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5)),
+        retry_max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", 8)),
+        model_concurrency=parse_model_concurrency(os.getenv("LLM_MODEL_CONCURRENCY", "gpt-4-0613=8,gpt-3.5-turbo-16k=16")),
+        default_concurrency=int(os.getenv("LLM_DEFAULT_CONCURRENCY", 16)),
+        breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", 5)),
+        breaker_reset=float(os.getenv("LLM_BREAKER_RESET", 30)),
+    )
+
+
+llm_gateway = create_llm_gateway()
@@ -0,0 +1,249 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+
+from dotenv import load_dotenv
+
+from database.repository import MessageRepository, GptMessageRepository
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class MessageJournal:
+    # 채팅 턴 write-behind 저장
+    # 턴마다 로컬 spool 파일(append-only)에 먼저 기록하고, 메모리 버퍼를 주기적으로(또는 가득 차면) Mongo에 일괄 저장
+    # 저장에 성공한 spool segment만 삭제하고, 시작 시 남아있는 segment를 다시 저장 (turn_id로 중복 제거)
+    REPLAY_DEDUP_WINDOW = 200
+
+    def __init__(self, spool_dir: str, flush_interval: float, max_buffer: int, fsync: bool = True):
+        self.spool_dir = spool_dir
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.fsync = fsync
+
+        self.buffer = []
+        self.segment_ids = []  # 버퍼의 턴이 기록된 spool segment
+        self.spool_file = None
+        self.spool_path = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.flusher = None
+
+        self.counters = {
+            "recorded_turns": 0, "flushed_turns": 0, "flushes": 0, "failed_flushes": 0,
+            "mongo_writes": 0, "replayed_turns": 0, "duplicate_turns": 0,
+        }
+
+    def start(self):
+        if self.flusher is not None:
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.replay()
+        self.flusher = threading.Thread(target=self.run, name="message-journal", daemon=True)
+        self.flusher.start()
+
+    def shutdown(self):
+        if self.flusher is None:
+            return
+        self.stopped.set()
+        self.wakeup.set()
+        self.flusher.join()
+        self.flusher = None
+        self.flush()
+
+    def segment_path(self) -> str:
+        # 프로세스마다 다른 파일에 기록
+        return os.path.join(self.spool_dir, f"journal-{os.getpid()}-{uuid.uuid4().hex}.jsonl")
+
+    def open_segment(self):
+        self.spool_path = self.segment_path()
+        self.spool_file = open(self.spool_path, "a", encoding="utf-8")
+
+    def record_turn(self, star_id: int, user_input: str, gpt_response: str) -> None:
+        turn = {
+            "turn_id": uuid.uuid4().hex,
+            "star_id": star_id,
+            "user_input": user_input,
+            "gpt_response": gpt_response,
+            "created_at": (datetime.datetime.utcnow() + datetime.timedelta(hours=9)).isoformat(),
+        }
+        line = json.dumps(turn, ensure_ascii=False) + "\n"
+
+        with self.lock:
+            if self.spool_file is None:
+                self.open_segment()
+            self.spool_file.write(line)
+            self.spool_file.flush()
+            if self.fsync:
+                os.fsync(self.spool_file.fileno())
+
+            self.buffer.append(turn)
+            if not self.segment_ids or self.segment_ids[-1] != self.spool_path:
+                self.segment_ids.append(self.spool_path)
+            self.counters["recorded_turns"] += 1
+            full = len(self.buffer) >= self.max_buffer
+
+        if full:
+            self.wakeup.set()
+
+    def request_flush(self) -> None:
+        # 다음 주기를 기다리지 않고 저장 (세션 종료 시)
+        self.wakeup.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self.flush_lock:
+            with self.lock:
+                if not self.buffer:
+                    return
+                turns, self.buffer = self.buffer, []
+                segments, self.segment_ids = self.segment_ids, []
+                # 이후의 턴은 새 segment에 기록
+                if self.spool_file is not None:
+                    self.spool_file.close()
+                    self.spool_file = None
+
+            try:
+                self.write(turns)
+            except Exception as e:
+                # 실패한 턴은 버퍼 앞에 되돌려 다음 주기에 재시도 (segment도 유지)
+                # 턴에 할당된 seq가 유지되므로 일부 컬렉션에 이미 저장된 메시지는 다시 쓰이지 않음
+                logger.error(f"Error flushing message journal: {e}")
+                with self.lock:
+                    self.buffer = turns + self.buffer
+                    self.segment_ids = segments + [path for path in self.segment_ids if path not in segments]
+                    self.counters["failed_flushes"] += 1
+                return
+
+            for path in segments:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with self.lock:
+                self.counters["flushes"] += 1
+                self.counters["flushed_turns"] += len(turns)
+
+    def write(self, turns: list, dedup: bool = False) -> None:
+        # 컬렉션마다 bulk_write 한 번 (messages, gpt messages, 최근 메시지)
+        # 턴의 seq는 처음 쓸 때 한 번만 할당하고, 재시도 시 같은 seq로 다시 씀 (이미 저장된 bucket은 건너뜀)
+        message_repo = MessageRepository()
+        gpt_message_repo = GptMessageRepository()
+
+        self.write_store(message_repo.message_buckets, turns, "message_seq", dedup, lambda turn: [
+            {"sender": "user", "content": turn["user_input"]},
+            {"sender": "assistant", "content": turn["gpt_response"]},
+        ])
+        stored_by_star = self.write_store(gpt_message_repo.gpt_message_buckets, turns, "gpt_message_seq", dedup, lambda turn: [
+            {"role": "user", "content": turn["user_input"]},
+            {"role": "assistant", "content": turn["gpt_response"]},
+        ])
+        # 재연결용 최근 메시지 (star 문서)
+        gpt_message_repo.push_recent_messages(stored_by_star)
+        self.counters["mongo_writes"] += 3
+
+    def write_store(self, bucket_store, turns: list, seq_field: str, dedup: bool, build) -> dict:
+        # build(turn): [user 메시지, assistant 메시지]
+        if dedup:
+            turns = self.remove_saved(bucket_store, turns)
+
+        turns_by_star = {}
+        for turn in turns:
+            turns_by_star.setdefault(turn["star_id"], []).append(turn)
+
+        stored_by_star = {}
+        for star_id, star_turns in turns_by_star.items():
+            new_turns = [turn for turn in star_turns if seq_field not in turn]
+            if new_turns:
+                first_seq = bucket_store.reserve_seq(star_id, len(new_turns) * 2)
+                for i, turn in enumerate(new_turns):
+                    turn[seq_field] = first_seq + i * 2
+
+            stored = []
+            for turn in star_turns:
+                created_at = datetime.datetime.fromisoformat(turn["created_at"])
+                for i, message in enumerate(build(turn)):
+                    stored.append({**message, "created_at": created_at, "turn_id": turn["turn_id"], "seq": turn[seq_field] + i})
+            stored_by_star[star_id] = sorted(stored, key=lambda message: message["seq"])
+
+        bucket_store.write_stored(stored_by_star)
+        return stored_by_star
+
+    def remove_saved(self, bucket_store, turns: list) -> list:
+        # Mongo 저장 후 segment 삭제 전에 종료된 경우: 최근 메시지에 이미 있는 turn_id는 제외
+        saved_turn_ids = {}
+        remaining = []
+        for turn in turns:
+            star_id = turn["star_id"]
+            if star_id not in saved_turn_ids:
+                saved_turn_ids[star_id] = {message.get("turn_id") for message in bucket_store.tail(star_id, self.REPLAY_DEDUP_WINDOW)}
+            if turn["turn_id"] in saved_turn_ids[star_id]:
+                self.counters["duplicate_turns"] += 1
+            else:
+                remaining.append(turn)
+        return remaining
+
+    def is_live_segment(self, path: str) -> bool:
+        # 실행 중인 다른 worker 프로세스가 기록 중인 segment
+        try:
+            pid = int(os.path.basename(path).split("-")[1])
+        except (IndexError, ValueError):
+            return False
+        if pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def replay(self) -> None:
+        # 이전 실행에서 저장하지 못한 턴을 시작 시 저장
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "journal-*.jsonl")), key=os.path.getmtime):
+            if self.is_live_segment(path):
+                continue
+
+            turns = []
+            with open(path, encoding="utf-8") as spool_file:
+                for line in spool_file:
+                    try:
+                        turns.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # 기록 중 종료되어 잘린 마지막 줄
+                        logger.warning(f"Skipping truncated journal line in {path}")
+            if turns:
+                try:
+                    self.write(turns, dedup=True)
+                except Exception as e:
+                    # 다음 시작 시 다시 시도
+                    logger.error(f"Error replaying message journal {path}: {e}")
+                    continue
+                self.counters["replayed_turns"] += len(turns)
+            os.remove(path)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "buffered_turns": len(self.buffer)}
+
+
+message_journal = MessageJournal(
+    spool_dir=os.getenv("MESSAGE_JOURNAL_DIR", "./message_journal"),
+    flush_interval=float(os.getenv("MESSAGE_JOURNAL_FLUSH_INTERVAL", 1.0)),
+    max_buffer=int(os.getenv("MESSAGE_JOURNAL_MAX_BUFFER", 100)),
+    fsync=os.getenv("MESSAGE_JOURNAL_FSYNC", "true").lower() == "true",
+)
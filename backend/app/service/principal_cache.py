@@ -0,0 +1,98 @@
+from abc import ABC, abstractmethod
+import os
+import threading
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from sqlalchemy import inspect
+
+from database.orm import User
+
+load_dotenv()
+
+
+def to_principal(user: User) -> dict:
+    # 세션에 묶이지 않도록 컬럼 값만 저장 (공유 캐시에도 그대로 직렬화 가능)
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def from_principal(principal: dict) -> User:
+    # 요청마다 새 transient 객체를 만들어 요청 간에 ORM 객체를 공유하지 않음
+    # 사용자 정보를 수정하는 핸들러는 user_repo로 다시 조회한 뒤 저장해야 함
+    return User(**principal)
+
+
+class PrincipalCache(ABC):
+    # 인증된 사용자 캐시 인터페이스 (user_id -> principal dict)
+    @abstractmethod
+    def get(self, user_id: str) -> dict | None:
+        pass
+
+    @abstractmethod
+    def set(self, user_id: str, principal: dict) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, user_id: str) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class NullPrincipalCache(PrincipalCache):
+    # 캐시 비활성화 (매 요청 DB 조회)
+    def get(self, user_id: str) -> dict | None:
+        return None
+
+    def set(self, user_id: str, principal: dict) -> None:
+        pass
+
+    def delete(self, user_id: str) -> None:
+        pass
+
+
+class InMemoryPrincipalCache(PrincipalCache):
+    # 프로세스 로컬 TTL 캐시 (다른 프로세스의 변경은 TTL이 지나야 반영)
+    def __init__(self, ttl: float, max_size: int):
+        self.cache = TTLCache(maxsize=max_size, ttl=ttl)
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: str) -> dict | None:
+        with self.lock:
+            principal = self.cache.get(user_id)
+            self.counters["hits" if principal is not None else "misses"] += 1
+            return principal
+
+    def set(self, user_id: str, principal: dict) -> None:
+        with self.lock:
+            self.cache[user_id] = principal
+
+    def delete(self, user_id: str) -> None:
+        with self.lock:
+            if self.cache.pop(user_id, None) is not None:
+                self.counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self.cache),
+                "hit_rate": self.counters["hits"] / total if total else 0.0,
+            }
+
+
+def create_principal_cache() -> PrincipalCache:
+    # AUTH_CACHE_BACKEND: memory(기본) / none
+    if os.getenv("AUTH_CACHE_BACKEND", "memory") == "none":
+        return NullPrincipalCache()
+
+    return InMemoryPrincipalCache(
+        ttl=float(os.getenv("AUTH_CACHE_TTL", 30)),
+        max_size=int(os.getenv("AUTH_CACHE_SIZE", 10000)),
+    )
+
+
+principal_cache = create_principal_cache()
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from ai_models.text_generation.retrieval import UtteranceIndex
+from database.repository import GptMessageRepository
+
+load_dotenv()
+
+
+class RetrievalIndexCache:
+    # star별로 역직렬화된 UtteranceIndex LRU (프로세스 로컬, 같은 star의 세션끼리 공유)
+    # 버전은 GridFS 파일 _id: 인덱스가 다시 저장되면 _id가 바뀌므로 miss로 처리
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def get(self, star_id: int, version):
+        with self.lock:
+            entry = self.entries.get(star_id)
+            if entry is None or entry[0] != version:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(star_id)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def set(self, star_id: int, version, index: UtteranceIndex) -> None:
+        with self.lock:
+            self.entries[star_id] = (version, index)
+            self.entries.move_to_end(star_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, star_id: int) -> None:
+        with self.lock:
+            self.entries.pop(star_id, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "max_size": self.max_size,
+                "hit_rate": self.counters["hits"] / total if total else 0.0,
+            }
+
+
+retrieval_index_cache = RetrievalIndexCache(max_size=int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", 32)))
+
+
+def load_retrieval_index(star_id: int, gpt_message_repo: GptMessageRepository) -> UtteranceIndex | None:
+    # 블로킹 (GridFS 조회 + 압축 해제/CSC 생성), 스레드풀에서 호출
+    # 캐시 hit이면 files 문서 한 건만 조회, 인덱스가 없는 star는 None
+    version = gpt_message_repo.get_retrieval_index_version(star_id)
+    if version is None:
+        retrieval_index_cache.invalidate(star_id)
+        return None
+
+    index = retrieval_index_cache.get(star_id, version)
+    if index is not None:
+        return index
+
+    index_data = gpt_message_repo.get_retrieval_index(star_id, file_id=version)
+    if index_data is None:
+        return None
+    index = UtteranceIndex.from_bytes(index_data)
+    retrieval_index_cache.set(star_id, version, index)
+    return index
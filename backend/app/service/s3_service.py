@@ -1,6 +1,6 @@
 import os
 import boto3
-from botocore.exceptions import NoCredentialsError
+from botocore.exceptions import ClientError, NoCredentialsError
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
@@ -18,9 +18,10 @@ class S3Service:
         )
         self.S3_BUCKET = s3_bucket
     
-    def upload_fileobj_to_s3(self, file_stream, object_name):
+    def upload_fileobj_to_s3(self, file_stream, object_name, content_type=None):
+        extra_args = {"ContentType": content_type} if content_type else None
         try:
-            self.s3_client.upload_fileobj(file_stream, self.S3_BUCKET, object_name)
+            self.s3_client.upload_fileobj(file_stream, self.S3_BUCKET, object_name, ExtraArgs=extra_args)
         except Exception as e:
             print(e)
             raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to upload to S3")
@@ -31,6 +32,27 @@ class S3Service:
         except Exception as e:
             print(e)
             raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to upload to S3")
+
+    def object_exists(self, object_name) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.S3_BUCKET, Key=object_name)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            print(e)
+            raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to access S3")
+
+    def download_bytes(self, object_name) -> bytes:
+        try:
+            response = self.s3_client.get_object(Bucket=self.S3_BUCKET, Key=object_name)
+            return response["Body"].read()
+        except Exception as e:
+            print(e)
+            raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to download from S3")
+
+    def get_object_url(self, object_name) -> str:
+        return f"https://{self.S3_BUCKET}.s3.amazonaws.com/{object_name}"
  
 
 def get_s3_service(
@@ -0,0 +1,91 @@
+import os
+
+from database.connection import SeesionFactory
+from database.orm import Star
+from database.repository import StarRepository, GptMessageRepository
+from service.ai_serving import PromptGeneration, SpeakerIdentification, VoiceCloning
+from service.job_queue import job_service
+from service.voice_profile import voice_profile_cache
+
+
+# star 생성: 대화 파일 파싱 -> 특징 추출 -> 프롬프트 저장 (-> 검색 인덱스 저장)
+# 실패하면 프롬프트 없이 만들어진 star를 삭제
+def create_star_job(report, star_id: int, request: dict, text_file_path: str):
+    session = SeesionFactory()
+    try:
+        with open(text_file_path, "rb") as original_text_file:
+            prompt_generator = PromptGeneration(request, original_text_file)
+            chat_prompt_input_data = prompt_generator.create_prompt_input(report=report)
+
+        report("saving", 90)
+        StarRepository(session).update_star_prompt(star_id=star_id, chat_prompt_input_data=chat_prompt_input_data)
+
+        gptmessage_repo = GptMessageRepository()
+        gptmessage_repo.save_p_data(star_id=star_id, p_data=chat_prompt_input_data)
+
+        # 턴마다 관련 발화를 찾기 위한 검색 인덱스 저장
+        if PromptGeneration.RETRIEVAL_CONTEXT:
+            report("building_retrieval_index", 95)
+            retrieval_index = prompt_generator.build_retrieval_index()
+            gptmessage_repo.save_retrieval_index(star_id=star_id, index_data=retrieval_index.to_bytes())
+    except Exception:
+        session.rollback()
+        delete_unfinished_star(star_id)
+        raise
+    finally:
+        session.close()
+        os.remove(text_file_path)
+
+
+def delete_unfinished_star(star_id: int) -> None:
+    session = SeesionFactory()
+    try:
+        star_repo = StarRepository(session)
+        star_repo.delete_star_mongo(star_id=star_id)
+        star_repo.delete_star(star_id=star_id)
+    finally:
+        session.close()
+
+
+def recover_interrupted_jobs() -> None:
+    # 시작 시: 이전 프로세스에서 실행 중이던 job을 실패로 기록하고, 생성 중이던 star 삭제
+    for job in job_service.fail_interrupted_jobs():
+        if job["job_type"] == "create_star" and job.get("star_id") is not None:
+            delete_unfinished_star(job["star_id"])
+
+
+# star 음성 선택: 선택한 화자 구간 이어붙이기 -> XTTS latent 추출 -> DB 저장
+def select_voice_job(report, star_id: int, user_id: str, selected_speaker_id: str, speech_list: dict, original_voice_base64: str):
+    report("combining_voice", 10)
+    speaker_identification = SpeakerIdentification()
+    combined_voice_file_path = speaker_identification.save_star_voice(selected_speaker_id, speech_list, original_voice_base64, star_id)
+
+    try:
+        report("encoding_voice", 40)
+        voice_cloning = VoiceCloning()
+        gpt_cond_latent_data, speaker_embedding_data = voice_cloning.get_star_voice_vector(
+            star_id=star_id
+        )
+    finally:
+        # latent 추출이 실패해도 이어붙인 임시 wav 삭제
+        if os.path.exists(combined_voice_file_path):
+            os.remove(combined_voice_file_path)
+
+    report("saving", 90)
+    session = SeesionFactory()
+    try:
+        star_repo = StarRepository(session)
+        star: Star | None = star_repo.get_star_by_star_id(star_id=star_id, user_id=user_id)
+        if not star:
+            raise ValueError("Star Not Found")
+
+        star: Star = star.insert_npy(
+            gpt_cond_latent_npy=gpt_cond_latent_data,
+            speaker_embedding_npy=speaker_embedding_data
+        )
+        star_repo.update_star(star=star)
+    finally:
+        session.close()
+
+    # 이전 음성 프로필로 디코딩된 latent 제거
+    voice_profile_cache.invalidate(star_id)
@@ -0,0 +1,328 @@
+import asyncio
+from collections import deque
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# worker 프로세스마다 한 번만 로드되는 XTTS 모델
+worker_model = None
+
+
+def init_worker(model_name: str, num_threads: int):
+    global worker_model
+    import torch
+    from ai_models.voice_cloning.xtts import load_model
+
+    torch.set_num_threads(num_threads)
+    worker_model = load_model(model_name)
+
+
+def synthesize_in_worker(text, gpt_cond_latent, speaker_embedding):
+    from ai_models.voice_cloning.xtts import inference
+
+    return inference(worker_model, text, gpt_cond_latent, speaker_embedding)
+
+
+def synthesize_encoded_in_worker(text, gpt_cond_latent, speaker_embedding, audio_format, bitrate):
+    from ai_models.voice_cloning.audio_encoding import encode_audio
+    from ai_models.voice_cloning.xtts import SAMPLE_RATE
+
+    # 인코딩까지 worker에서 처리하여 API 프로세스로는 압축된 bytes만 전달
+    output = synthesize_in_worker(text, gpt_cond_latent, speaker_embedding)
+    return encode_audio(output, SAMPLE_RATE, audio_format, bitrate)
+
+
+def stream_in_worker(text, gpt_cond_latent, speaker_embedding, chunk_queue, cancel_event):
+    from ai_models.voice_cloning.xtts import inference_stream
+
+    # 생성된 PCM chunk를 바로 API 프로세스로 전달, 클라이언트가 끊기면 중단
+    try:
+        for chunk in inference_stream(worker_model, text, gpt_cond_latent, speaker_embedding):
+            if cancel_event.is_set():
+                break
+            chunk_queue.put(chunk)
+    finally:
+        chunk_queue.put(None)
+
+
+class TTSQueueFull(Exception):
+    pass
+
+
+# 숫자가 작을수록 먼저 처리 (명시적인 재생 요청이 speculative 합성보다 항상 우선)
+PRIORITY_EXPLICIT = 0
+PRIORITY_SPECULATIVE = 1
+
+
+class TTSJob:
+    def __init__(self, func, args, priority, key, star_id):
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.key = key
+        self.star_id = star_id
+        self.started = False
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+
+class TTSEngine:
+    # XTTS 추론 전용 프로세스 풀
+    # API는 bounded queue에 작업을 넣고 await, dispatcher가 빈 worker에 하나씩 전달
+    # speculative 작업은 star당 max_speculative_per_star개, 전체 대기열의 절반까지만 허용
+    def __init__(self, model_name: str, workers: int, threads_per_worker: int, max_queue: int, timeout: float, max_speculative_per_star: int = 1):
+        self.model_name = model_name
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_speculative_per_star = max_speculative_per_star
+        self.sequence = itertools.count()
+        self.jobs_by_key = {}
+        self.speculative_by_star = {}
+
+        self.executor = None
+        self.executor_generation = 0
+        self.executor_lock = threading.Lock()
+        self.manager = None
+        self.poll_executor = None
+        self.queue = None
+        self.dispatchers = []
+
+        self.running = 0
+        self.counters = {
+            "submitted": 0, "completed": 0, "failed": 0, "timed_out": 0, "cancelled": 0, "rejected": 0,
+            "speculative_submitted": 0, "speculative_dropped": 0, "promoted": 0,
+        }
+        self.queue_wait_ms = deque(maxlen=1000)
+        self.inference_ms = deque(maxlen=1000)
+
+    def start(self):
+        # startup hook에서 시작 (torch 상태 공유를 피하기 위해 spawn 사용)
+        # 스트리밍용 Manager 프로세스도 여기서 생성하여 요청 처리 중 이벤트 루프가 막히지 않도록 함
+        if self.executor is not None:
+            return
+        self.executor = self.create_executor()
+        self.manager = multiprocessing.get_context("spawn").Manager()
+        # 스트림마다 chunk 대기 스레드 하나 (실행 중 + 대기 중 작업 수 이하)
+        self.poll_executor = ThreadPoolExecutor(max_workers=self.workers + self.max_queue, thread_name_prefix="tts-stream")
+        self.queue = asyncio.PriorityQueue(maxsize=self.max_queue)
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.model_name, self.threads_per_worker),
+        )
+
+    def shutdown(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+        if self.poll_executor is not None:
+            self.poll_executor.shutdown(wait=False, cancel_futures=True)
+            self.poll_executor = None
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self.queue.get()
+            # 타임아웃/취소된 작업, 우선순위 상향으로 중복된 작업은 worker에 보내지 않음
+            if job.future.done() or job.started:
+                continue
+            job.started = True
+
+            started_at = time.perf_counter()
+            self.queue_wait_ms.append((started_at - job.enqueued_at) * 1000)
+            self.running += 1
+            generation = self.executor_generation
+            try:
+                future = loop.run_in_executor(self.executor, job.func, *job.args)
+                # 결과는 wait 후 꺼냄: 풀 재생성으로 future가 취소되어도 dispatcher는 계속 실행
+                # (dispatcher 자체가 취소된 경우에만 CancelledError가 전달됨)
+                await asyncio.wait({future})
+                if future.cancelled():
+                    raise BrokenProcessPool("TTS worker pool was restarted")
+                error = future.exception()
+                if error is not None and not isinstance(error, Exception):
+                    # SystemExit 등 BaseException도 작업 실패로만 처리
+                    raise RuntimeError(f"TTS worker failed: {error!r}") from error
+                result = future.result()
+            except Exception as e:
+                self.counters["failed"] += 1
+                if isinstance(e, BrokenProcessPool):
+                    self.restart_executor(generation)
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self.counters["completed"] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.running -= 1
+                self.inference_ms.append((time.perf_counter() - started_at) * 1000)
+
+    def restart_executor(self, generation: int) -> None:
+        # worker 프로세스가 비정상 종료된 경우 풀을 다시 생성
+        # 같은 풀에서 실패한 dispatcher들 중 처음 한 번만 재생성 (이미 새로 만든 풀은 유지)
+        with self.executor_lock:
+            if generation != self.executor_generation or self.executor is None:
+                return
+            logger.error("TTS worker pool is broken, restarting")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self.create_executor()
+            self.executor_generation += 1
+
+    async def submit(self, func, *args, timeout: float | None = None, priority: int = PRIORITY_EXPLICIT, key: str | None = None, star_id: int | None = None):
+        self.start()
+
+        if priority == PRIORITY_SPECULATIVE:
+            if (
+                self.speculative_by_star.get(star_id, 0) >= self.max_speculative_per_star
+                or self.queue.qsize() >= self.max_queue // 2
+            ):
+                self.counters["speculative_dropped"] += 1
+                raise TTSQueueFull()
+
+        job = TTSJob(func, args, priority, key, star_id)
+        try:
+            self.queue.put_nowait((priority, next(self.sequence), job))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise TTSQueueFull()
+        self.counters["submitted"] += 1
+
+        if key is not None:
+            self.jobs_by_key[key] = job
+        if priority == PRIORITY_SPECULATIVE:
+            self.counters["speculative_submitted"] += 1
+            self.speculative_by_star[star_id] = self.speculative_by_star.get(star_id, 0) + 1
+
+        try:
+            # shield: 대기 중 취소되어도 dispatcher가 future 상태를 확인할 수 있도록 함
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            job.future.cancel()
+            raise
+        except asyncio.CancelledError:
+            self.counters["cancelled"] += 1
+            job.future.cancel()
+            raise
+        finally:
+            if key is not None and self.jobs_by_key.get(key) is job:
+                del self.jobs_by_key[key]
+            if priority == PRIORITY_SPECULATIVE:
+                self.speculative_by_star[star_id] -= 1
+                if not self.speculative_by_star[star_id]:
+                    del self.speculative_by_star[star_id]
+
+    def promote(self, key: str) -> None:
+        # 대기 중인 speculative 작업에 재생 요청이 붙으면 명시적 우선순위로 다시 넣음
+        job: TTSJob | None = self.jobs_by_key.get(key)
+        if job is None or job.started or job.priority == PRIORITY_EXPLICIT:
+            return
+        try:
+            self.queue.put_nowait((PRIORITY_EXPLICIT, next(self.sequence), job))
+        except asyncio.QueueFull:
+            return
+        job.priority = PRIORITY_EXPLICIT
+        self.counters["promoted"] += 1
+
+    async def synthesize(self, text, gpt_cond_latent, speaker_embedding, timeout: float | None = None, priority: int = PRIORITY_EXPLICIT, key: str | None = None, star_id: int | None = None):
+        return await self.submit(
+            synthesize_in_worker, text, gpt_cond_latent, speaker_embedding,
+            timeout=timeout, priority=priority, key=key, star_id=star_id,
+        )
+
+    async def synthesize_encoded(self, text, gpt_cond_latent, speaker_embedding, audio_format: str, bitrate: str, timeout: float | None = None, priority: int = PRIORITY_EXPLICIT, key: str | None = None, star_id: int | None = None) -> bytes:
+        return await self.submit(
+            synthesize_encoded_in_worker, text, gpt_cond_latent, speaker_embedding, audio_format, bitrate,
+            timeout=timeout, priority=priority, key=key, star_id=star_id,
+        )
+
+    async def stream(self, text, gpt_cond_latent, speaker_embedding, timeout: float | None = None):
+        # worker 프로세스에서 생성되는 PCM chunk를 순서대로 반환하는 async generator
+        self.start()
+        if self.queue.full():
+            self.counters["rejected"] += 1
+            raise TTSQueueFull()
+
+        loop = asyncio.get_running_loop()
+        chunk_queue = self.manager.Queue()
+        cancel_event = self.manager.Event()
+        submit_task = asyncio.create_task(
+            self.submit(stream_in_worker, text, gpt_cond_latent, speaker_embedding, chunk_queue, cancel_event, timeout=timeout)
+        )
+
+        try:
+            while True:
+                try:
+                    # 기본 executor를 점유하지 않도록 전용 스레드에서 최대 0.5초씩 대기
+                    chunk = await loop.run_in_executor(self.poll_executor, chunk_queue.get, True, 0.5)
+                except queue.Empty:
+                    if submit_task.done():
+                        # 대기열 거절/타임아웃/worker 오류를 그대로 전달
+                        submit_task.result()
+                        break
+                    continue
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            cancel_event.set()
+            if not submit_task.done():
+                submit_task.cancel()
+
+    def stats(self) -> dict:
+        def summarize(values):
+            if not values:
+                return {"avg": 0.0, "p50": 0.0, "p95": 0.0}
+            ordered = sorted(values)
+            return {
+                "avg": sum(ordered) / len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            }
+
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            **self.counters,
+            "queue_wait_ms": summarize(self.queue_wait_ms),
+            "inference_ms": summarize(self.inference_ms),
+        }
+
+
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 1))
+
+tts_engine = TTSEngine(
+    model_name=os.getenv("VOICE_CLONING_MODEL_PATH"),
+    workers=TTS_WORKERS,
+    threads_per_worker=int(os.getenv("TTS_THREADS_PER_WORKER", max(1, (os.cpu_count() or 1) // TTS_WORKERS))),
+    max_queue=int(os.getenv("TTS_MAX_QUEUE", 16)),
+    timeout=float(os.getenv("TTS_TIMEOUT", 60)),
+    max_speculative_per_star=int(os.getenv("TTS_SPECULATIVE_PER_STAR", 1)),
+)
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from ai_models.voice_cloning.latent_format import load_latent
+from database.connection import SeesionFactory
+from database.orm import Star
+from database.repository import StarRepository
+
+load_dotenv()
+
+
+def voice_profile_version(star: Star) -> str:
+    # voice-select에서 저장한 latent 해시 (이름 변경 등 다른 수정으로는 음성 캐시가 무효화되지 않음)
+    return star.voice_version or ""
+
+
+class VoiceProfileCache:
+    # star별로 디코딩된 (gpt_cond_latent, speaker_embedding) LRU (프로세스 로컬)
+    # 버전이 다르면 miss로 처리하므로 다른 프로세스에서 voice-select가 실행되어도 오래된 latent를 쓰지 않음
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, star_id: int, version: str):
+        with self.lock:
+            entry = self.entries.get(star_id)
+            if entry is None or entry[0] != version:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(star_id)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def set(self, star_id: int, version: str, profile) -> None:
+        with self.lock:
+            self.entries[star_id] = (version, profile)
+            self.entries.move_to_end(star_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, star_id: int) -> None:
+        with self.lock:
+            if self.entries.pop(star_id, None) is not None:
+                self.counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "max_size": self.max_size,
+                "hit_rate": self.counters["hits"] / total if total else 0.0,
+            }
+
+
+voice_profile_cache = VoiceProfileCache(max_size=int(os.getenv("VOICE_PROFILE_CACHE_SIZE", 64)))
+
+
+def get_voice_profile(star: Star):
+    # 캐시 hit이면 DB blob 조회와 역직렬화를 생략, 음성이 없는 star는 None
+    version = voice_profile_version(star)
+    profile = voice_profile_cache.get(star.star_id, version)
+    if profile is not None:
+        return profile
+
+    session = SeesionFactory()
+    try:
+        voice_data = StarRepository(session).get_star_voice_data(star_id=star.star_id)
+    finally:
+        session.close()
+
+    if voice_data is None or voice_data[0] is None or voice_data[1] is None:
+        return None
+
+    profile = (load_latent(voice_data[0]), load_latent(voice_data[1]))
+    voice_profile_cache.set(star.star_id, version, profile)
+    return profile